@@ -0,0 +1,72 @@
+"""
+Times serializing a 1,000 package listing response with the standard
+library encoder Flask used before (dates formatted in package_to_dict,
+Decimals through a default hook) against the app's FastJSONProvider.
+
+    python benchmarks/bench_json.py
+"""
+import json
+import timeit
+from datetime import date, timedelta
+from decimal import Decimal
+
+from trucksandpackages import app, serializers
+from trucksandpackages.domain import model
+from trucksandpackages.json_provider import FastJSONProvider
+
+PACKAGES = 1000
+REPEAT = 200
+
+def stdlib_default(obj):
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError
+
+def build_response(host_url: str = "http://localhost:8080/") -> dict:
+    return {
+        "packages": [
+            serializers.package_to_dict(
+                model.Package(
+                    "overnight",
+                    Decimal("5.25") + i,
+                    date(2022, 6, 25) + timedelta(days=i % 30),
+                    package_id=5629499534213120 + i,
+                    carrier_id=5644004762845184 if i % 2 else None
+                ),
+                f"{host_url}packages/{5629499534213120 + i}",
+                serializers.carrier_to_dict(
+                    5644004762845184 if i % 2 else None, f"{host_url}trucks"
+                )
+            ) for i in range(PACKAGES)
+        ],
+        "next": None
+    }
+
+def stdlib_dumps(response: dict) -> str:
+    # package_to_dict used to format each date itself.
+    for package in response["packages"]:
+        package["shipping_date"] = package["shipping_date"].strftime("%m/%d/%Y")
+    return json.dumps(
+        response, default=stdlib_default, sort_keys=True, separators=(",", ":")
+    )
+
+def main():
+    provider = FastJSONProvider(app)
+    provider.compact = True
+    for label, dumps in [
+        ("stdlib json", stdlib_dumps),
+        ("FastJSONProvider", provider.dumps),
+    ]:
+        seconds = min(
+            timeit.repeat(lambda: dumps(build_response()), number=1, repeat=REPEAT)
+        )
+        build_seconds = min(
+            timeit.repeat(build_response, number=1, repeat=REPEAT)
+        )
+        print(
+            f"{label}: {(seconds - build_seconds) * 1000:.2f} ms to serialize "
+            f"{PACKAGES} packages"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Compares the memory footprint, construction time and attribute read time
+of the slotted domain model against the property-wrapped, __dict__-backed
+classes it replaced.
+
+    python benchmarks/bench_model.py
+"""
+import gc
+import timeit
+import tracemalloc
+from datetime import date
+from decimal import Decimal
+
+from trucksandpackages.domain import model
+
+INSTANCES = 100000
+
+class DictBackedPackage:
+
+    def __init__(
+        self,
+        shipping_type: str,
+        weight: Decimal,
+        shipping_date: date,
+        package_id: str = None,
+        carrier_id: str = None,
+        version: int = 0
+    ):
+        self._shipping_type = shipping_type
+        self._weight = weight
+        self._shipping_date = shipping_date
+        self._package_id = package_id
+        self._carrier_id = carrier_id
+        self._version = version
+
+    @property
+    def shipping_type(self) -> str:
+        return self._shipping_type
+
+    @property
+    def weight(self) -> Decimal:
+        return self._weight
+
+    @property
+    def shipping_date(self) -> date:
+        return self._shipping_date
+
+    @property
+    def package_id(self) -> str:
+        return self._package_id
+
+    @property
+    def carrier_id(self) -> str:
+        return self._carrier_id
+
+def build_packages(package_class):
+    weight = Decimal("5.5")
+    shipping_date = date(2022, 6, 25)
+    return [
+        package_class("overnight", weight, shipping_date, package_id=i, carrier_id=None)
+        for i in range(INSTANCES)
+    ]
+
+def read_packages(packages):
+    for package in packages:
+        package.shipping_type, package.weight, package.shipping_date
+        package.package_id, package.carrier_id
+
+def measure(label: str, package_class):
+    gc.collect()
+    tracemalloc.start()
+    packages = build_packages(package_class)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    build_seconds = min(
+        timeit.repeat(lambda: build_packages(package_class), number=1, repeat=5)
+    )
+    read_seconds = min(
+        timeit.repeat(lambda: read_packages(packages), number=1, repeat=5)
+    )
+    print(
+        f"{label}: {memory / INSTANCES:.0f} bytes per package, "
+        f"{build_seconds / INSTANCES * 1e9:.0f} ns to construct one, "
+        f"{read_seconds / INSTANCES * 1e9:.0f} ns to read its fields"
+    )
+
+def main():
+    print(f"{INSTANCES} packages")
+    measure("dict-backed with properties", DictBackedPackage)
+    measure("__slots__", model.Package)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Times load planning for 100k unassigned packages spread over a fleet of
+capacity-limited trucks, and checks that no truck is planned past its
+limits.
+
+    python benchmarks/bench_planning.py
+"""
+import random
+import time
+from datetime import date
+from decimal import Decimal
+
+from trucksandpackages.domain import model, planning
+
+PACKAGES = 100000
+TRUCKS = 60
+
+def main():
+    random.seed(1)
+    trucks = [
+        model.Truck(
+            "Box truck", 26, 2, "manager", truck_id=truck_id,
+            max_packages=2000, max_weight=Decimal(20000)
+        )
+        for truck_id in range(TRUCKS)
+    ]
+    packages = [
+        model.Package(
+            random.choice(["ground", "overnight", "same-day"]),
+            Decimal(random.randint(1, 9999)) / 100,
+            date(2022, 6, random.randint(1, 30)),
+            package_id
+        )
+        for package_id in range(PACKAGES)
+    ]
+
+    start = time.perf_counter()
+    load_plan = planning.plan_loads(trucks, packages)
+    elapsed = time.perf_counter() - start
+
+    packages_by_id = {package.package_id: package for package in packages}
+    for truck in trucks:
+        package_ids = load_plan.assignments[truck.truck_id]
+        assert len(package_ids) <= truck.max_packages
+        assert sum(packages_by_id[i].weight for i in package_ids) <= truck.max_weight
+
+    print(
+        f"planned {PACKAGES} packages onto {TRUCKS} trucks in {elapsed:.2f}s: "
+        f"{load_plan.assigned_package_count()} assigned, "
+        f"{len(load_plan.unassigned_package_ids)} left over"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Times entering and leaving a DatastoreUnitOfWork, which begins and rolls
+back one transaction, with a client built per unit of work versus the
+shared per-process client.
+
+Run against the Datastore emulator (or a real project):
+    gcloud beta emulators datastore start
+    $(gcloud beta emulators datastore env-init)
+    python benchmarks/bench_unit_of_work.py
+"""
+import time
+
+from google.cloud import datastore
+
+from trucksandpackages.services import unit_of_work
+
+ITERATIONS = 200
+
+def time_units_of_work(label: str):
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        with unit_of_work.DatastoreUnitOfWork():
+            pass
+    elapsed = time.perf_counter() - start
+    print(f"{label}: {elapsed / ITERATIONS * 1000:.2f} ms per unit of work")
+
+def main():
+    shared_client = unit_of_work.get_client
+    unit_of_work.get_client = datastore.Client
+    try:
+        time_units_of_work("client per unit of work")
+    finally:
+        unit_of_work.get_client = shared_client
+    time_units_of_work("shared client")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+from trucksandpackages.cache import LRUCache
+
+def test_get_returns_value_that_was_set():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+    assert cache.hits == 1
+
+def test_entry_past_its_expiry_is_a_miss(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("trucksandpackages.cache.time.time", lambda: now[0])
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1, expires_at=1010.0)
+
+    now[0] = 1010.0
+
+    assert cache.get("a") is None
+    assert cache.misses == 1
+    assert len(cache) == 0
+
+def test_entry_expires_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("trucksandpackages.cache.time.time", lambda: now[0])
+    cache = LRUCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+
+    now[0] = 1009.0
+    assert cache.get("a") == 1
+    now[0] = 1010.0
+    assert cache.get("a") is None
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+def test_fill_is_skipped_after_pop():
+    cache = LRUCache(maxsize=2)
+    generation = cache.generation
+
+    cache.pop("a")
+    cache.set("a", "stale", generation=generation)
+
+    assert cache.get("a") is None
+
+def test_fill_is_kept_without_an_invalidation():
+    cache = LRUCache(maxsize=2)
+
+    cache.set("a", 1, generation=cache.generation)
+
+    assert cache.get("a") == 1
@@ -0,0 +1,14 @@
+from trucksandpackages.common import is_valid_cursor
+
+def test_cursor_with_or_without_padding_is_valid():
+    assert is_valid_cursor("CkQSPmoRc35")
+    assert is_valid_cursor("Cg==")
+    assert is_valid_cursor("Cg")
+
+def test_cursor_outside_urlsafe_base64_is_invalid():
+    assert not is_valid_cursor("not a cursor!")
+    assert not is_valid_cursor("Cg+/")
+    assert not is_valid_cursor("")
+
+def test_cursor_of_impossible_length_is_invalid():
+    assert not is_valid_cursor("a")
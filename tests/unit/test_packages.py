@@ -0,0 +1,46 @@
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from trucksandpackages.packages import parse_package_search
+
+def search(**args):
+    return parse_package_search(SimpleNamespace(args=args))
+
+def test_parse_search_without_parameters():
+    assert search() == ({}, None)
+
+def test_parse_search_with_filters_and_sort():
+    filters, sort = search(
+        shipping_type="ground",
+        shipping_date_from="06/25/2022",
+        sort="-shipping_date"
+    )
+
+    assert filters == {
+        "shipping_type": "ground",
+        "shipping_date_from": date(2022, 6, 25)
+    }
+    assert sort == "-shipping_date"
+
+def test_parse_search_with_weight_range():
+    filters, sort = search(weight_min="1.5", weight_max="10", sort="weight")
+
+    assert filters == {"weight_min": Decimal("1.5"), "weight_max": Decimal("10")}
+    assert sort == "weight"
+
+@pytest.mark.parametrize("args", [
+    {"shipping_date": "2022-06-25"},
+    {"weight_min": "heavy"},
+    {"weight_max": "NaN"},
+    {"weight_min": "Infinity"},
+    {"sort": "shipping_type"},
+    {"shipping_date_from": "06/25/2022", "weight_min": "1"},
+    {"shipping_date_to": "06/25/2022", "sort": "weight"},
+    {"weight_max": "10", "sort": "-shipping_date"},
+])
+def test_parse_search_rejects_invalid_parameters(args):
+    with pytest.raises(ValueError):
+        search(**args)
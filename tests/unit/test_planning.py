@@ -0,0 +1,106 @@
+from datetime import date
+from decimal import Decimal
+from trucksandpackages.domain.model import Truck, Package
+from trucksandpackages.domain.planning import plan_loads
+
+def test_plan_places_heaviest_packages_first():
+    truck = Truck("Box truck", 20, 2, "abc123", truck_id="t1", max_weight=Decimal("10"))
+    packages = [
+        Package("ground", Decimal("3"), date(2022, 6, 25), "p1"),
+        Package("ground", Decimal("8"), date(2022, 6, 25), "p2"),
+        Package("ground", Decimal("2"), date(2022, 6, 25), "p3"),
+    ]
+
+    plan = plan_loads([truck], packages)
+
+    assert plan.assignments["t1"] == ["p2", "p3"]
+    assert plan.unassigned_package_ids == ["p1"]
+
+def test_plan_fills_trucks_in_order():
+    first_truck = Truck("Box truck", 20, 2, "abc123", truck_id="t1", max_packages=2)
+    second_truck = Truck("Box truck", 20, 2, "abc123", truck_id="t2", max_packages=2)
+    packages = [
+        Package("ground", Decimal(weight), date(2022, 6, 25), f"p{weight}")
+        for weight in range(1, 4)
+    ]
+
+    plan = plan_loads([first_truck, second_truck], packages)
+
+    assert plan.assignments == {"t1": ["p3", "p2"], "t2": ["p1"]}
+    assert plan.unassigned_package_ids == []
+
+def test_plan_uses_first_truck_with_room_for_package():
+    small_truck = Truck("Van", 10, 2, "abc123", truck_id="t1", max_weight=Decimal("5"))
+    large_truck = Truck("Box truck", 20, 2, "abc123", truck_id="t2", max_weight=Decimal("50"))
+    packages = [
+        Package("ground", Decimal("20"), date(2022, 6, 25), "p1"),
+        Package("ground", Decimal("4"), date(2022, 6, 25), "p2"),
+    ]
+
+    plan = plan_loads([small_truck, large_truck], packages)
+
+    assert plan.assignments == {"t1": ["p2"], "t2": ["p1"]}
+
+def test_plan_counts_packages_already_on_truck():
+    truck = Truck(
+        "Box truck", 20, 2, "abc123", truck_id="t1",
+        max_packages=2, max_weight=Decimal("10")
+    )
+    truck.load_package(Package("ground", Decimal("9"), date(2022, 6, 25), "p0"))
+    packages = [
+        Package("ground", Decimal("2"), date(2022, 6, 25), "p1"),
+        Package("ground", Decimal("1"), date(2022, 6, 25), "p2"),
+    ]
+
+    plan = plan_loads([truck], packages)
+
+    assert plan.assignments["t1"] == ["p2"]
+    assert plan.unassigned_package_ids == ["p1"]
+
+def test_plan_groups_by_shipping_date_then_type():
+    truck = Truck("Box truck", 20, 2, "abc123", truck_id="t1")
+    packages = [
+        Package("overnight", Decimal("1"), date(2022, 6, 26), "p1"),
+        Package("ground", Decimal("9"), date(2022, 6, 26), "p2"),
+        Package("overnight", Decimal("5"), date(2022, 6, 25), "p3"),
+        Package("ground", Decimal("2"), date(2022, 6, 26), "p4"),
+    ]
+
+    plan = plan_loads([truck], packages)
+
+    assert plan.assignments["t1"] == ["p3", "p2", "p4", "p1"]
+
+def test_plan_never_exceeds_exact_weight_limit():
+    truck = Truck("Box truck", 20, 2, "abc123", truck_id="t1", max_weight=Decimal("1.0005"))
+    packages = [
+        Package("ground", Decimal("0.5"), date(2022, 6, 25), "p1"),
+        Package("ground", Decimal("0.5004"), date(2022, 6, 25), "p2"),
+    ]
+
+    plan = plan_loads([truck], packages)
+
+    assert plan.assignments["t1"] == ["p2"]
+    assert plan.unassigned_package_ids == ["p1"]
+
+def test_plan_without_trucks_leaves_every_package_unassigned():
+    packages = [Package("ground", Decimal("1"), date(2022, 6, 25), "p1")]
+
+    plan = plan_loads([], packages)
+
+    assert plan.assignments == {}
+    assert plan.unassigned_package_ids == ["p1"]
+
+def test_plan_leaves_packages_without_a_valid_weight_unassigned():
+    truck = Truck("Box truck", 20, 2, "abc123", truck_id="t1", max_weight=Decimal("10"))
+    packages = [
+        Package("ground", Decimal("NaN"), date(2022, 6, 25), "p1"),
+        Package("ground", Decimal("-5"), date(2022, 6, 25), "p2"),
+        Package("ground", Decimal("Infinity"), date(2022, 6, 25), "p3"),
+        Package("ground", Decimal("10"), date(2022, 6, 25), "p4"),
+        Package("ground", Decimal("4"), date(2022, 6, 25), "p5"),
+    ]
+
+    plan = plan_loads([truck], packages)
+
+    assert plan.assignments["t1"] == ["p4"]
+    assert plan.unassigned_package_ids == ["p1", "p2", "p3", "p5"]
@@ -26,4 +26,113 @@ def test_unassign_package_from_truck():
     truck.unassign_package_id(package.package_id)
 
     assert len(truck.package_ids) == 0
-    assert package.package_id not in truck.package_ids
\ No newline at end of file
+    assert package.package_id not in truck.package_ids
+
+def test_change_truck_owner():
+    truck = Truck("Box truck", 20, 2, "abc123")
+    truck.owner = "xyz789"
+
+    assert truck.owner == "xyz789"
+
+def test_packages_with_same_id_are_equal():
+    package = Package("overnight", Decimal(5.0), "06/25/2022", "938xyz")
+    same_package = Package("ground", Decimal(2.0), "06/26/2022", "938xyz")
+
+    assert package == same_package
+    assert len({package, same_package}) == 1
+
+def test_loading_packages_adds_to_truck_totals():
+    truck = Truck("Box truck", 20, 2, "abc123")
+    truck.load_package(Package("overnight", Decimal("5.5"), "06/25/2022", "938xyz"))
+    truck.load_package(Package("ground", Decimal("2"), "06/25/2022", "112abc"))
+
+    assert truck.package_count == 2
+    assert truck.total_weight == Decimal("7.5")
+
+def test_loading_package_twice_counts_its_weight_once():
+    truck = Truck("Box truck", 20, 2, "abc123")
+    package = Package("overnight", Decimal("5.5"), "06/25/2022", "938xyz")
+    truck.load_package(package)
+    truck.load_package(package)
+
+    assert truck.package_count == 1
+    assert truck.total_weight == Decimal("5.5")
+
+def test_unloading_package_subtracts_from_truck_totals():
+    truck = Truck("Box truck", 20, 2, "abc123")
+    package = Package("overnight", Decimal("5.5"), "06/25/2022", "938xyz")
+    truck.load_package(package)
+    truck.load_package(Package("ground", Decimal("2"), "06/25/2022", "112abc"))
+
+    truck.unload_package(package)
+    truck.unload_package(package)
+
+    assert truck.package_count == 1
+    assert truck.total_weight == Decimal("2")
+
+def test_changing_package_weight_updates_truck_total_weight():
+    truck = Truck("Box truck", 20, 2, "abc123")
+    truck.load_package(Package("overnight", Decimal("5.5"), "06/25/2022", "938xyz"))
+
+    truck.change_package_weight("938xyz", Decimal("5.5"), Decimal("8"))
+    truck.change_package_weight("112abc", Decimal("1"), Decimal("100"))
+
+    assert truck.total_weight == Decimal("8")
+
+def test_rebuild_load_only_counts_packages_carried_by_truck():
+    truck = Truck("Box truck", 20, 2, "abc123", truck_id="t1")
+    truck.package_ids = {"938xyz", "112abc", "555mmm", "404nnn"}
+    truck.total_weight = Decimal("999")
+
+    truck.rebuild_load([
+        Package("overnight", Decimal("5.5"), "06/25/2022", "938xyz", carrier_id="t1"),
+        Package("ground", Decimal("2"), "06/25/2022", "112abc", carrier_id="t1"),
+        Package("ground", Decimal("3"), "06/25/2022", "555mmm", carrier_id="t2"),
+        Package("ground", Decimal("40"), "06/25/2022", "777qqq", carrier_id="t1"),
+    ])
+
+    assert truck.package_ids == {"938xyz", "112abc"}
+    assert truck.package_count == 2
+    assert truck.total_weight == Decimal("7.5")
+
+def test_truck_without_limits_has_capacity_for_any_load():
+    truck = Truck("Box truck", 20, 2, "abc123")
+    package = Package("freight", Decimal("100000"), "06/25/2022", "938xyz")
+
+    assert truck.has_capacity_for([package])
+
+def test_truck_has_no_capacity_past_max_packages():
+    truck = Truck("Box truck", 20, 2, "abc123", max_packages=2)
+    truck.load_package(Package("overnight", Decimal("1"), "06/25/2022", "938xyz"))
+    batch = [
+        Package("ground", Decimal("1"), "06/25/2022", "112abc"),
+        Package("ground", Decimal("1"), "06/25/2022", "777qqq"),
+    ]
+
+    assert truck.has_capacity_for(batch[:1])
+    assert not truck.has_capacity_for(batch)
+
+def test_truck_has_no_capacity_past_max_weight():
+    truck = Truck("Box truck", 20, 2, "abc123", max_weight=Decimal("10"))
+    truck.load_package(Package("overnight", Decimal("6"), "06/25/2022", "938xyz"))
+
+    assert truck.has_capacity_for(
+        [Package("ground", Decimal("4"), "06/25/2022", "112abc")]
+    )
+    assert not truck.has_capacity_for(
+        [Package("ground", Decimal("4.5"), "06/25/2022", "112abc")]
+    )
+
+def test_packages_already_on_truck_do_not_use_more_capacity():
+    truck = Truck("Box truck", 20, 2, "abc123", max_packages=1, max_weight=Decimal("6"))
+    package = Package("overnight", Decimal("6"), "06/25/2022", "938xyz")
+    truck.load_package(package)
+
+    assert truck.has_capacity_for([package, package])
+
+def test_lowered_limits_can_leave_truck_over_capacity():
+    truck = Truck("Box truck", 20, 2, "abc123")
+    truck.load_package(Package("overnight", Decimal("6"), "06/25/2022", "938xyz"))
+    truck.max_weight = Decimal("5")
+
+    assert not truck.is_within_capacity()
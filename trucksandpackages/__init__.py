@@ -1,9 +1,13 @@
-from flask import Flask, render_template, session
+from flask import Flask, jsonify, render_template, session
 
-from trucksandpackages import auth, config, trucks, truckmanagers, packages
+from trucksandpackages import (
+    auth, config, exceptions, json_provider, trucks, truckmanagers, packages
+)
+from trucksandpackages.services import services, unit_of_work
 
 app = Flask(__name__)
 app.config.from_object(config.DevelopmentConfig())
+app.json = json_provider.FastJSONProvider(app)
 
 auth.register_to_auth0(app)
 
@@ -23,3 +27,27 @@ def home():
         )
     else:
         return render_template("home.html")
+
+@app.cli.command("rebuild-truck-loads")
+def rebuild_truck_loads():
+    """Rebuild every truck's package list and load totals from its packages."""
+    rebuilt_truck_ids = services.rebuild_all_truck_loads(
+        unit_of_work.DatastoreUnitOfWork()
+    )
+    print(f"Rebuilt every truck's load; {len(rebuilt_truck_ids)} had drifted")
+
+@app.cli.command("backfill-package-weights")
+def backfill_package_weights():
+    """Add the numeric weight used by package searches to older packages."""
+    backfilled_count = services.backfill_package_weights(
+        unit_of_work.DatastoreUnitOfWork()
+    )
+    print(f"Backfilled the weight of {backfilled_count} package(s)")
+
+@app.errorhandler(exceptions.DeadlineExceededError)
+def deadline_exceeded(e: exceptions.DeadlineExceededError):
+    response_504_error = jsonify({
+        "Error": e.message
+    })
+    response_504_error.status_code = 504
+    return response_504_error
@@ -1,18 +1,21 @@
-import json
-from typing import List
+import hashlib
+import logging
 from urllib.parse import quote_plus, urlencode
-from urllib.request import urlopen
 
 import flask
 from authlib.integrations.flask_client import OAuth
 from jose import jwt
 
-from trucksandpackages import exceptions
+from trucksandpackages import cache, exceptions, jwks
 from trucksandpackages.services import services, unit_of_work
-from trucksandpackages.domain import model
+
+logger = logging.getLogger(__name__)
 
 bp = flask.Blueprint("auth", __name__, url_prefix="/auth")
 
+# Each worker logs its verified token cache hit rate after this many lookups.
+TOKEN_CACHE_STATS_LOG_INTERVAL = 1000
+
 def register_to_auth0(app: flask.Flask) -> OAuth:
     oauth = OAuth(app)
     auth0 = oauth.register(
@@ -28,6 +31,19 @@ def register_to_auth0(app: flask.Flask) -> OAuth:
         server_metadata_url=f'https://{app.config["AUTH0_DOMAIN"]}/.well-known/openid-configuration'
     )
     app.config["oauth"] = oauth
+    app.config["jwks"] = jwks.JWKSKeyStore(
+        f"https://{app.config['AUTH0_DOMAIN']}/.well-known/jwks.json",
+        cache_ttl=app.config["JWKS_CACHE_TTL"],
+        fetch_timeout=app.config["JWKS_FETCH_TIMEOUT"],
+        refetch_interval=app.config["JWKS_REFETCH_INTERVAL"]
+    )
+    app.config["verified_tokens"] = cache.LRUCache(
+        maxsize=app.config["VERIFIED_TOKEN_CACHE_SIZE"]
+    )
+
+def _log_token_cache_stats(verified_tokens: cache.LRUCache):
+    if (verified_tokens.hits + verified_tokens.misses) % TOKEN_CACHE_STATS_LOG_INTERVAL == 0:
+        logger.info("Verified token cache stats: %s", verified_tokens.stats())
 
 def verify_jwt(request):
     """
@@ -45,11 +61,14 @@ def verify_jwt(request):
             },
             401
         )
-    
-    jsonurl = urlopen("https://"+ flask.current_app.config["AUTH0_DOMAIN"] + \
-        "/.well-known/jwks.json")
-    jwks = json.loads(jsonurl.read())
-    
+
+    verified_tokens: cache.LRUCache = flask.current_app.config["verified_tokens"]
+    token_digest = hashlib.sha256(token.encode()).hexdigest()
+    payload = verified_tokens.get(token_digest)
+    _log_token_cache_stats(verified_tokens)
+    if payload:
+        return payload
+
     try:
         unverified_header = jwt.get_unverified_header(token)
     except jwt.JWTError:
@@ -69,16 +88,8 @@ def verify_jwt(request):
             401
         )
     
-    rsa_key = {}
-    for key in jwks["keys"]:
-        if key["kid"] == unverified_header["kid"]:
-            rsa_key = {
-                "kty": key["kty"],
-                "kid": key["kid"],
-                "use": key["use"],
-                "n": key["n"],
-                "e": key["e"]
-            }
+    key_store: jwks.JWKSKeyStore = flask.current_app.config["jwks"]
+    rsa_key = key_store.get_key(unverified_header.get("kid"))
     if rsa_key:
         try:
             payload = jwt.decode(
@@ -112,6 +123,7 @@ def verify_jwt(request):
                 },
             401)
 
+        verified_tokens.set(token_digest, payload, expires_at=payload["exp"])
         return payload
     else:
         raise exceptions.NoRSAKeyError(
@@ -122,12 +134,6 @@ def verify_jwt(request):
             401
         )
 
-def user_already_saved(auth_id: str, users: List[model.User]) -> bool:
-    for user in users:
-        if user.auth_id == auth_id:
-            return True
-    return False
-
 @bp.route("/login")
 def login():
     oauth: OAuth = flask.current_app.config["oauth"]
@@ -141,11 +147,9 @@ def callback():
     token = oauth.auth0.authorize_access_token()
 
     auth_id = token["userinfo"]["sub"]
-    users = services.get_all_truck_managers(unit_of_work.DatastoreUnitOfWork())
-    if not user_already_saved(auth_id, users):
-        services.create_truck_manager(
-            auth_id, unit_of_work.DatastoreUnitOfWork()
-        )
+    services.get_or_create_truck_manager(
+        auth_id, unit_of_work.DatastoreUnitOfWork()
+    )
     
     flask.session["user"] = token
     return flask.redirect("/")
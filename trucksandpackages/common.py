@@ -1,10 +1,23 @@
-from typing import List
+import base64
+import binascii
+import re
+from typing import List, Set
+from urllib.parse import urlencode
 
-from flask import request, Response, make_response
+from flask import request, Response, jsonify, make_response
 
-def check_for_content_type_error_415(req: request) -> Response:
+DEFAULT_PAGE_LIMIT = 5
+MAX_PAGE_LIMIT = 100
+
+# Datastore cursors are urlsafe base64, with or without their padding.
+CURSOR_PATTERN = re.compile(r"[A-Za-z0-9_-]+={0,2}")
+
+def check_for_content_type_error_415(
+    req: request, acceptable_MIME_types: List[str] = None
+) -> Response:
+    acceptable_MIME_types = acceptable_MIME_types or ["application/json"]
     if "Content-Type" not in req.headers or \
-        req.headers["Content-Type"] != "application/json":
+        req.headers["Content-Type"] not in acceptable_MIME_types:
         error_res = make_response("Unsupported Media Type")
         error_res.status_code = 415
         return error_res
@@ -19,4 +32,73 @@ def check_for_accept_error_406(
             return None
     error_res = make_response("Not Acceptable")
     error_res.status_code = 406
-    return error_res
\ No newline at end of file
+    return error_res
+
+def check_for_pagination_error_400(req: request) -> Response:
+    try:
+        limit = int(req.args.get("limit", DEFAULT_PAGE_LIMIT))
+        offset = int(req.args.get("offset", "0"))
+    except ValueError:
+        limit, offset = 0, 0
+    if limit < 1 or offset < 0:
+        error_res = jsonify({
+            "Error": "limit must be a positive integer and offset a non-negative integer"
+        })
+        error_res.status_code = 400
+        return error_res
+    elif "cursor" in req.args and not is_valid_cursor(req.args["cursor"]):
+        error_res = jsonify({"Error": "cursor is not a valid page cursor"})
+        error_res.status_code = 400
+        return error_res
+    else:
+        return None
+
+def is_valid_cursor(cursor: str) -> bool:
+    if not CURSOR_PATTERN.fullmatch(cursor):
+        return False
+    try:
+        base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    except (binascii.Error, ValueError):
+        return False
+    return True
+
+def get_page_limit(req: request) -> int:
+    return min(int(req.args.get("limit", DEFAULT_PAGE_LIMIT)), MAX_PAGE_LIMIT)
+
+def next_page_url(req: request, limit: int, cursor: str) -> str:
+    args = {
+        key: value for key, value in req.args.items()
+        if key not in ("limit", "offset", "cursor")
+    }
+    args.update({"limit": limit, "cursor": cursor})
+    return f"{req.base_url}?{urlencode(args)}"
+
+def get_expand_values(req: request) -> List[str]:
+    return [value for value in req.args.get("expand", "").split(",") if value]
+
+def etag_for_version(version: int) -> str:
+    return str(version)
+
+def check_for_not_modified_304(req: request, version: int) -> Response:
+    if req.if_none_match.contains(etag_for_version(version)):
+        not_modified_res = make_response()
+        not_modified_res.status_code = 304
+        not_modified_res.set_etag(etag_for_version(version))
+        return not_modified_res
+    else:
+        return None
+
+def get_if_match_versions(req: request) -> Set[int]:
+    if not req.if_match or req.if_match.star_tag:
+        return None
+    return {int(etag) for etag in req.if_match.as_set() if etag.isdigit()}
+
+def precondition_failed_412(message: str) -> Response:
+    error_res = jsonify({"Error": message})
+    error_res.status_code = 412
+    return error_res
+
+def capacity_exceeded_409(message: str) -> Response:
+    error_res = jsonify({"Error": message})
+    error_res.status_code = 409
+    return error_res
@@ -12,6 +12,10 @@ class BaseConfig(object):
     AUTH0_CLIENT_ID = os.environ.get("AUTH0_CLIENT_ID")
     AUTH0_CLIENT_SECRET = os.environ.get("AUTH0_CLIENT_SECRET")
     SECRET_KEY = os.environ.get("SECRET_KEY")
+    JWKS_CACHE_TTL = 600
+    JWKS_FETCH_TIMEOUT = 2
+    JWKS_REFETCH_INTERVAL = 30
+    VERIFIED_TOKEN_CACHE_SIZE = 10000
 
 class DevelopmentConfig(BaseConfig):
     FLASK_ENV = os.environ.get("FLASK_ENV")
@@ -1,72 +1,56 @@
 from datetime import date
 from decimal import Decimal
-from typing import Set
+from typing import List, Set
 
 
 class Package:
 
+    __slots__ = (
+        "shipping_type",
+        "weight",
+        "shipping_date",
+        "package_id",
+        "carrier_id",
+        "version",
+    )
+
     def __init__(
         self,
         shipping_type: str,
         weight: Decimal,
         shipping_date: date,
         package_id: str = None,
-        carrier_id: str = None
+        carrier_id: str = None,
+        version: int = 0
     ):
-        self._shipping_type = shipping_type
-        self._weight = weight
-        self._shipping_date = shipping_date
-        self._package_id = package_id
-        self._carrier_id = carrier_id
-
-    @property
-    def shipping_type(self) -> str:
-        return self._shipping_type
-
-    @shipping_type.setter
-    def shipping_type(self, shipping_type):
-        self._shipping_type = shipping_type
-    
-    @property
-    def weight(self) -> Decimal:
-        return self._weight
-
-    @weight.setter
-    def weight(self, weight):
-        self._weight = weight
-    
-    @property
-    def shipping_date(self) -> date:
-        return self._shipping_date
-
-    @shipping_date.setter
-    def shipping_date(self, shipping_date):
-        self._shipping_date = shipping_date
-    
-    @property
-    def package_id(self) -> str:
-        return self._package_id
-
-    @package_id.setter
-    def package_id(self, package_id):
-        self._package_id = package_id
-
-    @property
-    def carrier_id(self):
-        return self._carrier_id
-
-    @carrier_id.setter
-    def carrier_id(self, new_carrier_id):
-        self._carrier_id = new_carrier_id
+        self.shipping_type = shipping_type
+        self.weight = weight
+        self.shipping_date = shipping_date
+        self.package_id = package_id
+        self.carrier_id = carrier_id
+        self.version = version
 
     def __eq__(self, other_package) -> bool:
-        return self._package_id == other_package.package_id
+        return self.package_id == other_package.package_id
 
     def __hash__(self) -> int:
-        return hash(self._package_id)
+        return hash(self.package_id)
 
 class Truck:
 
+    __slots__ = (
+        "truck_type",
+        "truck_length",
+        "axles",
+        "owner",
+        "truck_id",
+        "version",
+        "package_ids",
+        "total_weight",
+        "max_packages",
+        "max_weight",
+    )
+
     def __init__(
         self,
         truck_type: str,
@@ -74,118 +58,123 @@ class Truck:
         axles: int,
         owner: str,
         truck_id: str = None,
+        version: int = 0,
+        max_packages: int = None,
+        max_weight: Decimal = None,
     ):
-        self._truck_type = truck_type
-        self._truck_length = truck_length
-        self._axles = axles
-        self._owner = owner
-        self._truck_id = truck_id
-        self._package_ids: Set[str] = set()
-
-    @property
-    def truck_type(self) -> str:
-        return self._truck_type
-
-    @truck_type.setter
-    def truck_type(self, truck_type: str):
-        self._truck_type = truck_type
-    
-    @property
-    def truck_length(self) -> int:
-        return self._truck_length
-
-    @truck_length.setter
-    def truck_length(self, truck_length: int):
-        self._truck_length = truck_length
-    
-    @property
-    def axles(self) -> int:
-        return self._axles
-
-    @axles.setter
-    def axles(self, axles: int):
-        self._axles = axles
-
-    @property
-    def truck_id(self) -> str:
-        return self._truck_id
-
-    @truck_id.setter
-    def truck_id(self, truck_id: str):
-        self._truck_id = truck_id
-    
-    @property
-    def owner(self) -> str:
-        return self._owner
-
-    @owner.setter
-    def owner(self, auth_id: str):
-        self.owner = auth_id
+        self.truck_type = truck_type
+        self.truck_length = truck_length
+        self.axles = axles
+        self.owner = owner
+        self.truck_id = truck_id
+        self.version = version
+        self.package_ids: Set[str] = set()
+        self.total_weight = Decimal(0)
+        self.max_packages = max_packages
+        self.max_weight = max_weight
 
     @property
-    def package_ids(self) -> Set[str]:
-        return self._package_ids
-    
-    @package_ids.setter
-    def package_ids(self, package_ids: Set[str]):
-        self._package_ids = package_ids
+    def package_count(self) -> int:
+        return len(self.package_ids)
 
     def has_packages(self):
-        return len(self._package_ids) > 0
+        return len(self.package_ids) > 0
 
     def assign_package_id(self, package_id: str):
         if self._can_assign_package_id(package_id):
-            self._package_ids.add(package_id)
+            self.package_ids.add(package_id)
 
     def _can_assign_package_id(self, package_id: str):
-        return package_id not in self._package_ids
+        return package_id not in self.package_ids
 
     def unassign_package_id(self, package_id: str):
-        if package_id in self._package_ids:
-            self._package_ids.remove(package_id)
+        if package_id in self.package_ids:
+            self.package_ids.remove(package_id)
+
+    def load_package(self, package: Package):
+        if self._can_assign_package_id(package.package_id):
+            self.package_ids.add(package.package_id)
+            self.total_weight += package.weight
+
+    def unload_package(self, package: Package):
+        if package.package_id in self.package_ids:
+            self.package_ids.remove(package.package_id)
+            self.total_weight -= package.weight
+
+    def unload_all_packages(self):
+        self.package_ids = set()
+        self.total_weight = Decimal(0)
+
+    def change_package_weight(
+        self, package_id: str, old_weight: Decimal, new_weight: Decimal
+    ):
+        if package_id in self.package_ids:
+            self.total_weight += new_weight - old_weight
+
+    def has_capacity_for(self, packages: List[Package]) -> bool:
+        new_packages = {
+            package.package_id: package for package in packages
+            if self._can_assign_package_id(package.package_id)
+        }
+        added_weight = sum(
+            (package.weight for package in new_packages.values()), Decimal(0)
+        )
+        return self._within_capacity(
+            self.package_count + len(new_packages),
+            self.total_weight + added_weight
+        )
+
+    def is_within_capacity(self) -> bool:
+        return self._within_capacity(self.package_count, self.total_weight)
+
+    def _within_capacity(self, package_count: int, total_weight: Decimal) -> bool:
+        if self.max_packages is not None and package_count > self.max_packages:
+            return False
+        if self.max_weight is not None and total_weight > self.max_weight:
+            return False
+        return True
+
+    def rebuild_load(self, packages: List[Package]):
+        # Keeps only the listed packages that are actually carried by this
+        # truck, and recomputes the totals from them.
+        loaded_packages = [
+            package for package in packages
+            if package.package_id in self.package_ids
+            and package.carrier_id == self.truck_id
+        ]
+        self.package_ids = {package.package_id for package in loaded_packages}
+        self.total_weight = sum(
+            (package.weight for package in loaded_packages), Decimal(0)
+        )
 
 
 class User:
 
+    __slots__ = (
+        "auth_id",
+        "user_id",
+        "truck_ids",
+    )
+
     def __init__(
         self,
         auth_id: str,
         user_id: str = None,
     ):
-        self._auth_id = auth_id
-        self._user_id = user_id
-        self._truck_ids: Set[str] = set()
-
-    @property
-    def auth_id(self) -> str:
-        return self._auth_id
-
-    @auth_id.setter
-    def auth_id(self, auth_id: str):
-        self._auth_id = auth_id
-
-    @property
-    def user_id(self) -> str:
-        return self._user_id
-
-    @user_id.setter
-    def user_id(self, user_id: str):
-        self._user_id = user_id
-
-    @property
-    def truck_ids(self) -> Set[str]:
-        return self._truck_ids
+        self.auth_id = auth_id
+        self.user_id = user_id
+        self.truck_ids: Set[str] = set()
 
     def has_assigned_trucks(self):
-        return len(self._truck_ids) > 0
+        return len(self.truck_ids) > 0
 
     def assign_truck(self, truck_id: str):
         if self._can_assign_truck_id(truck_id):
-            self._truck_ids.add(truck_id)
+            self.truck_ids.add(truck_id)
 
     def _can_assign_truck_id(self, truck_id: str):
-        return truck_id not in self._truck_ids
+        return truck_id not in self.truck_ids
 
     def unassign_truck(self, truck_id: str):
-        if truck_id in self._truck_ids:
-            self._truck_ids.remove(truck_id)
+        if truck_id in self.truck_ids:
+            self.truck_ids.remove(truck_id)
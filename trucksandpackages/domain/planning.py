@@ -0,0 +1,138 @@
+import math
+from decimal import Decimal
+from typing import Dict, List
+
+from trucksandpackages.domain.model import Package, Truck
+
+# Weights are planned in whole thousandths of a pound. Package weights are
+# rounded up and truck capacities down, so a plan never loads a truck past
+# its exact Decimal limit.
+WEIGHT_UNITS_PER_LB = 1000
+
+# Stands in for "no limit" on trucks without a max_packages or max_weight.
+UNLIMITED = 2 ** 62
+
+class LoadPlan:
+
+    __slots__ = (
+        "assignments",
+        "unassigned_package_ids",
+    )
+
+    def __init__(self):
+        self.assignments: Dict[str, List[str]] = {}
+        self.unassigned_package_ids: List[str] = []
+
+    def assigned_package_count(self) -> int:
+        return sum(len(package_ids) for package_ids in self.assignments.values())
+
+
+def plan_loads(trucks: List[Truck], packages: List[Package]) -> LoadPlan:
+    """
+    Packs packages onto trucks with first-fit decreasing. Packages are
+    planned in groups of the same shipping_date and shipping_type, earliest
+    date first, so a group ends up on as few trucks as possible; within a
+    group the heaviest packages are placed first, each on the first truck
+    (in the order given) with room for it by both count and weight.
+    """
+    plan = LoadPlan()
+    for truck in trucks:
+        plan.assignments[truck.truck_id] = []
+    if not trucks:
+        plan.unassigned_package_ids = [package.package_id for package in packages]
+        return plan
+
+    remaining_counts = [
+        UNLIMITED if truck.max_packages is None
+        else max(truck.max_packages - truck.package_count, 0)
+        for truck in trucks
+    ]
+    remaining_weights = [_remaining_weight_units(truck) for truck in trucks]
+    tree = _CapacityTree(
+        [
+            weight if count > 0 else -1
+            for count, weight in zip(remaining_counts, remaining_weights)
+        ]
+    )
+
+    # A weight that isn't a non-negative number can't be planned; a negative
+    # one would only add to its truck's remaining capacity.
+    plannable_packages = []
+    for package in packages:
+        if package.weight.is_finite() and package.weight >= 0:
+            plannable_packages.append(package)
+        else:
+            plan.unassigned_package_ids.append(package.package_id)
+
+    ordered_packages = sorted(
+        plannable_packages,
+        key=lambda package: (
+            package.shipping_date, package.shipping_type, -package.weight
+        )
+    )
+    for package in ordered_packages:
+        weight = _ceil_units(package.weight)
+        index = tree.first_fit(weight)
+        if index is None:
+            plan.unassigned_package_ids.append(package.package_id)
+            continue
+        plan.assignments[trucks[index].truck_id].append(package.package_id)
+        remaining_counts[index] -= 1
+        remaining_weights[index] -= weight
+        tree.update(
+            index, remaining_weights[index] if remaining_counts[index] > 0 else -1
+        )
+    return plan
+
+def _remaining_weight_units(truck: Truck) -> int:
+    if truck.max_weight is None:
+        return UNLIMITED
+    if not truck.total_weight.is_finite():
+        # A load total that isn't a number leaves no room that can be trusted.
+        return -1
+    return max(_floor_units(truck.max_weight - truck.total_weight), 0)
+
+def _ceil_units(weight: Decimal) -> int:
+    return math.ceil(weight * WEIGHT_UNITS_PER_LB)
+
+def _floor_units(weight: Decimal) -> int:
+    return math.floor(weight * WEIGHT_UNITS_PER_LB)
+
+
+class _CapacityTree:
+    """
+    Max segment tree over the trucks' remaining weight, kept in one flat
+    list, which finds the first truck that fits a package in O(log n)
+    instead of scanning every truck. A truck with no package slots left is
+    stored as -1 so nothing fits it.
+    """
+
+    def __init__(self, capacities: List[int]):
+        size = 1
+        while size < len(capacities):
+            size *= 2
+        self._size = size
+        self._nodes = [-1] * (2 * size)
+        self._nodes[size:size + len(capacities)] = capacities
+        for node in range(size - 1, 0, -1):
+            self._nodes[node] = max(self._nodes[2 * node], self._nodes[2 * node + 1])
+
+    def first_fit(self, weight: int):
+        nodes = self._nodes
+        if nodes[1] < weight:
+            return None
+        node = 1
+        while node < self._size:
+            node *= 2
+            if nodes[node] < weight:
+                node += 1
+        return node - self._size
+
+    def update(self, index: int, capacity: int):
+        nodes = self._nodes
+        node = index + self._size
+        nodes[node] = capacity
+        node //= 2
+        while node:
+            nodes[node] = max(nodes[2 * node], nodes[2 * node + 1])
+            node //= 2
@@ -27,4 +27,44 @@ class InvalidClaimsError(AuthError):
 class NoRSAKeyError(AuthError):
 
     def __init__(self, error, status_code) -> None:
-        super().__init__(error, status_code)
\ No newline at end of file
+        super().__init__(error, status_code)
+
+class ServiceError(Exception):
+
+    def __init__(self, message) -> None:
+        self.message = message
+
+class EntityNotFoundError(ServiceError):
+
+    def __init__(self, message) -> None:
+        super().__init__(message)
+
+class NotOwnerError(ServiceError):
+
+    def __init__(self, message) -> None:
+        super().__init__(message)
+
+class PackageAlreadyAssignedError(ServiceError):
+
+    def __init__(self, message) -> None:
+        super().__init__(message)
+
+class PackageNotAssignedError(ServiceError):
+
+    def __init__(self, message) -> None:
+        super().__init__(message)
+
+class VersionConflictError(ServiceError):
+
+    def __init__(self, message) -> None:
+        super().__init__(message)
+
+class TruckCapacityExceededError(ServiceError):
+
+    def __init__(self, message) -> None:
+        super().__init__(message)
+
+class DeadlineExceededError(ServiceError):
+
+    def __init__(self, message) -> None:
+        super().__init__(message)
\ No newline at end of file
@@ -0,0 +1,61 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+from trucksandpackages.domain import model
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def json_default(obj):
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, date):
+        # Equivalent to strftime("%m/%d/%Y"), at less than half the cost.
+        return f"{obj.month:02d}/{obj.day:02d}/{obj.year:04d}"
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, (model.Package, model.Truck, model.User)):
+        return {field: getattr(obj, field) for field in obj.__slots__}
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Serializes responses with orjson when it's installed, falling back to
+    the standard library otherwise. Decimals are written as strings and
+    dates as MM/DD/YYYY either way, and domain objects as their fields.
+    """
+
+    default = staticmethod(json_default)
+
+    def dumps(self, obj, **kwargs) -> str:
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=json_default, option=self._options()).decode()
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        options = self._options()
+        # Like the default provider, only whole responses are pretty-printed
+        # in debug mode; dumps() stays compact so NDJSON lines stay whole.
+        if self.compact is False or (self.compact is None and self._app.debug):
+            options |= orjson.OPT_INDENT_2
+        return self._app.response_class(
+            orjson.dumps(obj, default=json_default, option=options) + b"\n",
+            mimetype=self.mimetype
+        )
+
+    def _options(self) -> int:
+        # Dates are passed through so they keep the API's MM/DD/YYYY format
+        # instead of orjson's ISO 8601 output.
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
@@ -0,0 +1,103 @@
+import json
+import logging
+import re
+import threading
+import time
+from typing import Dict, Optional
+from urllib.request import urlopen
+
+from jose import jwk
+from jose.backends.base import Key
+
+logger = logging.getLogger(__name__)
+
+MAX_AGE_PATTERN = re.compile(r"max-age=(\d+)")
+
+class JWKSKeyStore:
+    """
+    Process-wide cache of the signing keys published at an Auth0 tenant's
+    JWKS endpoint. Keys are served from memory until the document's
+    Cache-Control max-age runs out, after which they're refreshed on a
+    background thread while the cached keys keep being served. A token
+    whose kid isn't cached triggers an early refetch, at most once every
+    `refetch_interval` seconds. Keys are parsed into public key objects
+    once per fetch, so verifying a token doesn't rebuild them.
+    """
+
+    def __init__(
+        self,
+        jwks_url: str,
+        cache_ttl: float = 600,
+        fetch_timeout: float = 2,
+        refetch_interval: float = 30,
+    ):
+        self._jwks_url = jwks_url
+        self._cache_ttl = cache_ttl
+        self._fetch_timeout = fetch_timeout
+        self._refetch_interval = refetch_interval
+        self._keys: Dict[str, Key] = {}
+        self._expires_at = 0.0
+        self._last_fetch = 0.0
+        self._fetch_lock = threading.Lock()
+        self._refresh_thread: threading.Thread = None
+
+    def get_key(self, kid: str) -> Optional[Key]:
+        now = time.monotonic()
+        can_refetch = now - self._last_fetch >= self._refetch_interval
+        key = self._keys.get(kid)
+        if key:
+            if now >= self._expires_at and can_refetch:
+                self._refresh_in_background()
+            return key
+
+        if not self._keys:
+            self._refresh(raise_errors=True)
+        elif can_refetch:
+            self._refresh(raise_errors=False)
+        return self._keys.get(kid)
+
+    def _refresh_in_background(self):
+        if self._refresh_thread and self._refresh_thread.is_alive():
+            return
+        self._refresh_thread = threading.Thread(
+            target=self._refresh, kwargs={"raise_errors": False}, daemon=True
+        )
+        self._refresh_thread.start()
+
+    def _refresh(self, raise_errors: bool):
+        last_fetch = self._last_fetch
+        with self._fetch_lock:
+            if self._last_fetch != last_fetch:
+                # Another thread fetched the document while we were waiting.
+                return
+            self._last_fetch = time.monotonic()
+            try:
+                keys, max_age = self._fetch()
+            except Exception:
+                if raise_errors:
+                    raise
+                logger.warning("Unable to refresh JWKS from %s", self._jwks_url, exc_info=True)
+                return
+            self._keys = keys
+            self._expires_at = self._last_fetch + max_age
+
+    def _fetch(self):
+        with urlopen(self._jwks_url, timeout=self._fetch_timeout) as response:
+            jwks = json.loads(response.read())
+            cache_control = response.headers.get("Cache-Control", "")
+        match = MAX_AGE_PATTERN.search(cache_control)
+        max_age = int(match.group(1)) if match else self._cache_ttl
+        keys = {
+            key["kid"]: jwk.construct(
+                {
+                    "kty": key["kty"],
+                    "kid": key["kid"],
+                    "use": key["use"],
+                    "n": key["n"],
+                    "e": key["e"]
+                },
+                algorithm="RS256"
+            )
+            for key in jwks["keys"] if key["kty"] == "RSA"
+        }
+        return (keys, max_age)
@@ -1,11 +1,16 @@
 
 from calendar import c
 import datetime
-from decimal import Decimal
+import json
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List
 
-from flask import Blueprint, jsonify, make_response, request
+from flask import (
+    Blueprint, Response, jsonify, make_response, request, stream_with_context
+)
+from flask import json as flask_json
 
-from trucksandpackages import common
+from trucksandpackages import auth, common, exceptions, serializers
 from trucksandpackages.domain import model
 from trucksandpackages.services import services, unit_of_work
 
@@ -13,30 +18,61 @@ bp = Blueprint("packages", __name__, url_prefix="/packages")
 
 CREATE_PACKAGE_REQUIRED_VALUES = ["shipping_type", "weight", "shipping_date"]
 
+MAX_BULK_PACKAGES = 10000
+
+DATE_SEARCH_PARAMETERS = ["shipping_date", "shipping_date_from", "shipping_date_to"]
+WEIGHT_SEARCH_PARAMETERS = ["weight_min", "weight_max"]
+SORT_VALUES = ["shipping_date", "-shipping_date", "weight", "-weight"]
+
 def has_required_values_for_create_package(json_data: dict):
     for value in CREATE_PACKAGE_REQUIRED_VALUES:
         if value not in json_data:
             return False
     return True
 
-def package_to_dict(package: model.Package, self_link: str, carrier_dict: dict) -> dict:
+def get_carriers_by_id(
+    packages: List[model.Package], auth_id: str
+) -> Dict[str, model.Truck]:
+    carrier_ids = {
+        str(package.carrier_id) for package in packages if package.carrier_id
+    }
+    if not carrier_ids:
+        return {}
+    carriers = services.get_trucks_by_ids(
+        list(carrier_ids),
+        unit_of_work.DatastoreUnitOfWork(read_only=True, eventual=True)
+    )
     return {
-        "id": package.package_id,
-        "shipping_type": package.shipping_type,
-        "weight": package.weight,
-        "shipping_date": package.shipping_date.strftime("%m/%d/%Y"),
-        "carrier": carrier_dict,
-        "self": self_link
+        str(carrier.truck_id): carrier for carrier in carriers
+        if carrier.owner == auth_id
     }
 
-def carrier_to_dict(carrier_id: str, host_url: str) -> dict:
-    if carrier_id:
-        return {
-            "id": carrier_id,
-            "self": f"{host_url}/{carrier_id}"
-        }
+def create_carrier_dict_for_package(
+    package: model.Package,
+    carriers_by_id: Dict[str, model.Truck],
+    host_url: str
+) -> dict:
+    carrier = None
+    if carriers_by_id is not None and package.carrier_id:
+        carrier = carriers_by_id.get(str(package.carrier_id))
+    if carrier:
+        return serializers.truck_to_dict(
+            carrier,
+            f"{host_url}trucks/{carrier.truck_id}",
+            serializers.create_list_of_package_dict(
+                carrier.package_ids, f"{host_url}packages"
+            )
+        )
     else:
+        return serializers.carrier_to_dict(package.carrier_id, f"{host_url}trucks")
+
+def get_carriers_by_id_for_request(
+    req: request, packages: List[model.Package]
+) -> Dict[str, model.Truck]:
+    if "carrier" not in common.get_expand_values(req):
         return None
+    payload = auth.verify_jwt(req)
+    return get_carriers_by_id(packages, payload["sub"])
 
 def contains_unallowed_attributes(json_data: dict) -> bool:
     for key in json_data:
@@ -44,6 +80,83 @@ def contains_unallowed_attributes(json_data: dict) -> bool:
             return True
     return False
 
+def parse_package_search(req: request) -> tuple:
+    filters = {}
+    if "shipping_type" in req.args:
+        filters["shipping_type"] = req.args["shipping_type"]
+    try:
+        for name in DATE_SEARCH_PARAMETERS:
+            if name in req.args:
+                filters[name] = datetime.datetime.strptime(
+                    req.args[name], "%m/%d/%Y"
+                ).date()
+        for name in WEIGHT_SEARCH_PARAMETERS:
+            if name in req.args:
+                filters[name] = Decimal(req.args[name])
+                if not filters[name].is_finite():
+                    raise InvalidOperation
+    except (InvalidOperation, ValueError):
+        raise ValueError(
+            "shipping dates must be formatted as MM/DD/YYYY and weights must be numbers"
+        )
+
+    sort = req.args.get("sort", None)
+    if sort is not None and sort not in SORT_VALUES:
+        raise ValueError(f"sort must be one of {', '.join(SORT_VALUES)}")
+
+    # Datastore only allows inequality filters on a single property, and
+    # requires that property to be the first sort order.
+    date_range = "shipping_date_from" in filters or "shipping_date_to" in filters
+    weight_range = "weight_min" in filters or "weight_max" in filters
+    if date_range and "shipping_date" in filters:
+        raise ValueError(
+            "shipping_date can't be combined with shipping_date_from or shipping_date_to"
+        )
+    if date_range and weight_range:
+        raise ValueError(
+            "A shipping date range can't be combined with a weight range"
+        )
+    if sort and date_range and sort.lstrip("-") != "shipping_date":
+        raise ValueError("A shipping date range can only be sorted by shipping_date")
+    if sort and weight_range and sort.lstrip("-") != "weight":
+        raise ValueError("A weight range can only be sorted by weight")
+    return (filters, sort)
+
+def parse_bulk_request_items(req: request) -> list:
+    if req.headers["Content-Type"] == "application/x-ndjson":
+        items = []
+        for line in req.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                items.append(None)
+        return items
+    else:
+        json_data = req.get_json(silent=True)
+        return json_data if isinstance(json_data, list) else None
+
+def parse_package_values(json_data) -> tuple:
+    if not isinstance(json_data, dict) or \
+        not has_required_values_for_create_package(json_data):
+        raise ValueError(
+            "The request object is missing at least one of the required attributes"
+        )
+    try:
+        weight = Decimal(str(json_data["weight"]))
+        if not weight.is_finite() or weight < 0:
+            raise InvalidOperation
+        shipping_date = datetime.datetime.strptime(
+            json_data["shipping_date"], "%m/%d/%Y"
+        ).date()
+    except (InvalidOperation, TypeError, ValueError):
+        raise ValueError(
+            "weight must be a non-negative number and shipping_date a date "
+            "formatted as MM/DD/YYYY"
+        )
+    return (json_data["shipping_type"], weight, shipping_date)
+
 @bp.route("", methods=["GET", "POST"])
 def create_package_or_get_packages():
     if request.method == "GET":
@@ -53,21 +166,46 @@ def create_package_or_get_packages():
         if response_406_error:
             return response_406_error
 
+        response_400_error = common.check_for_pagination_error_400(request)
+        if response_400_error:
+            return response_400_error
+
+        try:
+            filters, sort = parse_package_search(request)
+        except ValueError as e:
+            response_400_error = jsonify({"Error": str(e)})
+            response_400_error.status_code = 400
+            return response_400_error
+
         query_offset = int(request.args.get("offset", "0"))
-        query_limit = 5
-        packages, next_page_available = services.get_packages(
-            query_limit, query_offset, unit_of_work.DatastoreUnitOfWork()
+        query_limit = common.get_page_limit(request)
+        query_cursor = request.args.get("cursor", None)
+        packages, next_cursor = services.get_packages(
+            query_limit,
+            query_offset,
+            unit_of_work.DatastoreUnitOfWork(read_only=True, eventual=True),
+            query_cursor=query_cursor,
+            filters=filters,
+            sort=sort
         )
+        try:
+            carriers_by_id = get_carriers_by_id_for_request(request, packages)
+        except (exceptions.NoAuthHeaderError, exceptions.InvalidHeaderError) as e:
+            response_401_error = make_response(e.error)
+            response_401_error.status_code = e.status_code
+            return response_401_error
         response_200 = jsonify(
             {
                 "packages": [
-                    package_to_dict(
+                    serializers.package_to_dict(
                         package,
                         f"{request.base_url}/{package.package_id}",
-                        carrier_to_dict(package.carrier_id, f"{request.host_url}trucks")
+                        create_carrier_dict_for_package(
+                            package, carriers_by_id, request.host_url
+                        )
                     ) for package in packages
                 ],
-                "next": f"{request.base_url}?limit=5&offset={query_offset + query_limit}" if next_page_available else None
+                "next": common.next_page_url(request, query_limit, next_cursor) if next_cursor else None
             }
         )
         response_200.status_code = 200
@@ -110,13 +248,41 @@ def create_package_or_get_packages():
             "id": package_id,
             "shipping_type": shipping_type,
             "weight": weight,
-            "shipping_date": shipping_date.strftime("%m/%d/%Y"),
+            "shipping_date": shipping_date,
             "carrier": None,
             "self": f"{request.base_url}/{package_id}"
         })
         response_201.status_code = 201
         return response_201
 
+@bp.route("/export", methods=["GET"])
+def export_packages():
+    response_406_error = common.check_for_accept_error_406(
+        request, ["application/x-ndjson"]
+    )
+    if response_406_error:
+        return response_406_error
+
+    packages_url = f"{request.host_url}packages"
+    trucks_url = f"{request.host_url}trucks"
+
+    def generate_package_lines():
+        for package in services.iterate_packages(
+            unit_of_work.DatastoreUnitOfWork(read_only=True, eventual=True)
+        ):
+            yield flask_json.dumps(
+                serializers.package_to_dict(
+                    package,
+                    f"{packages_url}/{package.package_id}",
+                    serializers.carrier_to_dict(package.carrier_id, trucks_url)
+                )
+            ) + "\n"
+
+    return Response(
+        stream_with_context(generate_package_lines()),
+        mimetype="application/x-ndjson"
+    )
+
 @bp.route("/<package_id>", methods=["GET", "PATCH", "PUT", "DELETE"])
 def get_edit_or_delete_package(package_id: str):
     if request.method == "GET":
@@ -127,7 +293,9 @@ def get_edit_or_delete_package(package_id: str):
             return response_406_error
 
         package = services.get_package(
-            package_id, unit_of_work.DatastoreUnitOfWork()
+            package_id,
+            unit_of_work.DatastoreUnitOfWork(read_only=True),
+            use_cache=True
         )
         if not package:
             response_404_error = make_response(
@@ -138,13 +306,29 @@ def get_edit_or_delete_package(package_id: str):
             response_404_error.status_code = 404
             return response_404_error
         else:
+            try:
+                carriers_by_id = get_carriers_by_id_for_request(request, [package])
+            except (exceptions.NoAuthHeaderError, exceptions.InvalidHeaderError) as e:
+                response_401_error = make_response(e.error)
+                response_401_error.status_code = e.status_code
+                return response_401_error
+            if carriers_by_id is None:
+                response_304 = common.check_for_not_modified_304(
+                    request, package.version
+                )
+                if response_304:
+                    return response_304
             response_200 = jsonify(
-                package_to_dict(
+                serializers.package_to_dict(
                     package,
                     f"{request.base_url}",
-                    carrier_to_dict(package.carrier_id, f"{request.host_url}trucks")
+                    create_carrier_dict_for_package(
+                        package, carriers_by_id, request.host_url
+                    )
                 )
             )
+            if carriers_by_id is None:
+                response_200.set_etag(common.etag_for_version(package.version))
             response_200.status_code = 200
             return response_200
 
@@ -171,7 +355,9 @@ def get_edit_or_delete_package(package_id: str):
             )
             return response_400_error
         
-        package = services.get_package(package_id, unit_of_work.DatastoreUnitOfWork())
+        package = services.get_package(
+            package_id, unit_of_work.DatastoreUnitOfWork(read_only=True)
+        )
         if package:
             shipping_type = json_data.get("shipping_type", None)
             weight = json_data.get("weight", None)
@@ -183,20 +369,35 @@ def get_edit_or_delete_package(package_id: str):
                     json_data["shipping_date"], "%m/%d/%Y"
                 ).date()
             
-            services.edit_package(
-                package,
-                shipping_type=shipping_type,
-                weight=weight,
-                shipping_date=shipping_date,
-                unit_of_work=unit_of_work.DatastoreUnitOfWork()
-            )
+            try:
+                package = services.edit_package(
+                    package,
+                    shipping_type=shipping_type,
+                    weight=weight,
+                    shipping_date=shipping_date,
+                    unit_of_work=unit_of_work.DatastoreUnitOfWork(),
+                    if_match_versions=common.get_if_match_versions(request)
+                )
+            except exceptions.VersionConflictError as e:
+                return common.precondition_failed_412(e.message)
+            except exceptions.EntityNotFoundError as e:
+                response_404_error = make_response(
+                    jsonify({
+                        "Error": e.message
+                    })
+                )
+                response_404_error.status_code = 404
+                return response_404_error
+            except exceptions.TruckCapacityExceededError as e:
+                return common.capacity_exceeded_409(e.message)
             response_200 = jsonify(
-                package_to_dict(
+                serializers.package_to_dict(
                     package,
                     f"{request.base_url}",
-                    carrier_to_dict(package.carrier_id, f"{request.host_url}trucks")
+                    serializers.carrier_to_dict(package.carrier_id, f"{request.host_url}trucks")
                 )
             )
+            response_200.set_etag(common.etag_for_version(package.version))
             response_200.status_code = 200
             return response_200
 
@@ -230,7 +431,7 @@ def get_edit_or_delete_package(package_id: str):
             return response_400_error
 
         package = services.get_package(
-            package_id, unit_of_work.DatastoreUnitOfWork()
+            package_id, unit_of_work.DatastoreUnitOfWork(read_only=True)
         )
         if package:
             shipping_type = json_data["shipping_type"]
@@ -238,14 +439,26 @@ def get_edit_or_delete_package(package_id: str):
             shipping_date = datetime.datetime.strptime(
                 json_data["shipping_date"], "%m/%d/%Y"
             ).date()
-            services.edit_package(
-                package,
-                shipping_type=shipping_type,
-                weight=weight,
-                shipping_date=shipping_date,
-                unit_of_work=unit_of_work.DatastoreUnitOfWork(),
-                clear_carrier=True,
-            )
+            try:
+                services.edit_package(
+                    package,
+                    shipping_type=shipping_type,
+                    weight=weight,
+                    shipping_date=shipping_date,
+                    unit_of_work=unit_of_work.DatastoreUnitOfWork(),
+                    clear_carrier=True,
+                    if_match_versions=common.get_if_match_versions(request)
+                )
+            except exceptions.VersionConflictError as e:
+                return common.precondition_failed_412(e.message)
+            except exceptions.EntityNotFoundError as e:
+                response_404_error = make_response(
+                    jsonify({
+                        "Error": e.message
+                    })
+                )
+                response_404_error.status_code = 404
+                return response_404_error
             response_303 = make_response()
             response_303.status_code = 303
             response_303.headers["Location"] = f"{request.host_url}packages/{package_id}"
@@ -267,17 +480,9 @@ def get_edit_or_delete_package(package_id: str):
             return response_406_error
 
         package = services.get_package(
-            package_id, unit_of_work.DatastoreUnitOfWork()
+            package_id, unit_of_work.DatastoreUnitOfWork(read_only=True)
         )
         if package:
-            if package.carrier_id:
-                truck = services.get_truck(
-                    package.carrier_id, unit_of_work.DatastoreUnitOfWork()
-                )
-                truck.unassign_package_id(package.package_id)
-                services.edit_truck(
-                    truck, unit_of_work.DatastoreUnitOfWork()
-                )
             delete_successful = services.delete_package(
                 package_id, unit_of_work.DatastoreUnitOfWork()
             )
@@ -294,4 +499,69 @@ def get_edit_or_delete_package(package_id: str):
                 })
             )
             response_404_error.status_code = 404
-            return response_404_error
\ No newline at end of file
+            return response_404_error
+
+@bp.route("/bulk", methods=["POST"])
+def create_packages_in_bulk():
+    response_415_error = common.check_for_content_type_error_415(
+        request, ["application/json", "application/x-ndjson"]
+    )
+    if response_415_error:
+        return response_415_error
+
+    response_406_error = common.check_for_accept_error_406(
+        request, ["application/json"]
+    )
+    if response_406_error:
+        return response_406_error
+
+    items = parse_bulk_request_items(request)
+    if not items or len(items) > MAX_BULK_PACKAGES:
+        response_400_error = jsonify({
+            "Error": "The request body must hold between 1 and "
+                f"{MAX_BULK_PACKAGES} package objects"
+        })
+        response_400_error.status_code = 400
+        return response_400_error
+
+    results = []
+    valid_indexes = []
+    package_values = []
+    for index, item in enumerate(items):
+        try:
+            values = parse_package_values(item)
+        except ValueError as e:
+            results.append({"index": index, "status": 400, "Error": str(e)})
+            continue
+        results.append(None)
+        valid_indexes.append(index)
+        package_values.append(values)
+
+    package_ids = services.create_packages(
+        package_values, unit_of_work.DatastoreUnitOfWork()
+    )
+    for index, package_id, (shipping_type, weight, shipping_date) in zip(
+        valid_indexes, package_ids, package_values
+    ):
+        if package_id is None:
+            results[index] = {
+                "index": index,
+                "status": 503,
+                "Error": "The package couldn't be saved and can be retried"
+            }
+            continue
+        new_package = model.Package(
+            shipping_type, weight, shipping_date, package_id=package_id
+        )
+        result = serializers.package_to_dict(
+            new_package,
+            f"{request.host_url}packages/{package_id}",
+            None
+        )
+        result.update({"index": index, "status": 201})
+        results[index] = result
+
+    response = jsonify({"packages": results})
+    created_count = sum(1 for package_id in package_ids if package_id is not None)
+    response.status_code = 201 if created_count == len(items) else 207
+    return response
@@ -4,6 +4,9 @@ import abc
 # following reference, written by Harry Percival and Bob Gregory:
 # https://www.cosmicpython.com/book/chapter_02_repository.html
 
+# Datastore caps the number of keys a single lookup can read.
+MAX_KEYS_PER_LOOKUP = 1000
+
 class AbstractRepository(abc.ABC):
 
     @abc.abstractmethod
@@ -1,10 +1,27 @@
-from typing import List, Tuple
-from datetime import datetime
+from typing import Iterator, List, Tuple
+from datetime import date, datetime
 from decimal import Decimal
 
 from google.cloud import datastore
 from trucksandpackages.domain import model
-from trucksandpackages.repositories.abstract_repository import AbstractRepository
+from trucksandpackages.repositories.abstract_repository import (
+    AbstractRepository, MAX_KEYS_PER_LOOKUP
+)
+
+# Search filters and sort keys accepted by get_list, mapped to the
+# entity properties they query.
+FILTERS = {
+    "shipping_type": ("shipping_type", "="),
+    "shipping_date": ("shipping_date", "="),
+    "shipping_date_from": ("shipping_date", ">="),
+    "shipping_date_to": ("shipping_date", "<="),
+    "weight_min": ("weight_lbs", ">="),
+    "weight_max": ("weight_lbs", "<="),
+}
+SORT_PROPERTIES = {
+    "shipping_date": "shipping_date",
+    "weight": "weight_lbs",
+}
 
 class PackageRepository(AbstractRepository):
 
@@ -12,11 +29,13 @@ class PackageRepository(AbstractRepository):
         self,
         client_session: datastore.Client,
         datastore_config: datastore,
-        transaction: datastore.Transaction
+        transaction: datastore.Transaction,
+        eventual: bool = False
     ):
         self._client_session = client_session
         self._datastore = datastore_config
         self._transaction = transaction
+        self._eventual = eventual
         self._added_entity: datastore.Entity = None
         self._id_of_deleted_entity: str = None
 
@@ -29,69 +48,145 @@ class PackageRepository(AbstractRepository):
         return self._id_of_deleted_entity
 
     def add(self, package: model.Package):
-        if package.package_id:
-            key = self._client_session.key("packages", int(package.package_id))
-        else:
-            key = self._client_session.key("packages")
-
-        entity = self._datastore.Entity(key=key)
-        entity.update({
-            "shipping_type": package.shipping_type,
-            "weight": str(package.weight),
-            "shipping_date": str(package.shipping_date),
-            "carrier": package.carrier_id,
-        })
+        entity = self.package_to_entity(package)
         self._transaction.put(entity)
         self._added_entity = entity
 
+    def add_multi(self, packages: List[model.Package]):
+        entities = [self.package_to_entity(package) for package in packages]
+        self._transaction.put_multi(entities)
+
+
+    def allocate_ids(self, count: int) -> List[str]:
+        incomplete_key = self._client_session.key("packages")
+        keys = self._client_session.allocate_ids(incomplete_key, count)
+        return [key.id for key in keys]
 
     def get(self, package_id: str):
-        key = self._client_session.key("packages", int(package_id))
-        result = self._client_session.get(key=key)
+        key = self.key_for(package_id)
+        result = self._client_session.get(
+            key=key, transaction=self._transaction, eventual=self._eventual
+        )
         if result:
-            shipping_date = datetime.strptime(
-                result["shipping_date"], "%Y-%m-%d"
-            ).date()
-            package = model.Package(
-                shipping_type=result["shipping_type"],
-                weight=Decimal(result["weight"]),
-                shipping_date=shipping_date,
-                carrier_id=result["carrier"],
-                package_id=result.key.id
-            )
-            return package
+            return self.entity_to_package(result)
         else:
             return None
 
-    def get_list(self, limit: int, offset: int) -> Tuple[List[model.Package], bool]:
+    def get_multi(self, package_ids: List[str]) -> List[model.Package]:
+        keys = [self.key_for(package_id) for package_id in package_ids]
+        results = []
+        for start in range(0, len(keys), MAX_KEYS_PER_LOOKUP):
+            results.extend(
+                self._client_session.get_multi(
+                    keys[start:start + MAX_KEYS_PER_LOOKUP],
+                    transaction=self._transaction,
+                    eventual=self._eventual
+                )
+            )
+        return [self.entity_to_package(result) for result in results]
+
+    def get_list(
+        self,
+        limit: int,
+        offset: int = 0,
+        cursor: str = None,
+        filters: dict = None,
+        sort: str = None
+    ) -> Tuple[List[model.Package], str]:
         query = self._client_session.query(kind="packages")
-        query_iterator = query.fetch(limit=limit, offset=offset)
+        for name, value in (filters or {}).items():
+            property_name, operator = FILTERS[name]
+            query.add_filter(property_name, operator, self.to_property_value(value))
+        if sort:
+            descending = sort.startswith("-")
+            property_name = SORT_PROPERTIES[sort.lstrip("-")]
+            query.order = [f"-{property_name}" if descending else property_name]
+        query_iterator = query.fetch(
+            limit=limit,
+            offset=0 if cursor else offset,
+            start_cursor=cursor,
+            eventual=self._eventual
+        )
         pages = query_iterator.pages
         results = list(next(pages))
         packages = []
         for item in results:
-            shipping_date = datetime.strptime(
-                item["shipping_date"], "%Y-%m-%d"
-            ).date()
-            packages.append(
-                model.Package(
-                    shipping_type=item["shipping_type"],
-                    weight=Decimal(item["weight"]),
-                    shipping_date=shipping_date,
-                    carrier_id=item["carrier"],
-                    package_id=item.key.id
-                )
-            )
+            packages.append(self.entity_to_package(item))
 
-        if query_iterator.next_page_token:
-            next_page_available = True
-        else:
-            next_page_available = False
-        return (packages, next_page_available)
+        next_cursor = query_iterator.next_page_token
+        if isinstance(next_cursor, bytes):
+            next_cursor = next_cursor.decode("ascii")
+        return (packages, next_cursor)
+
+    def iterate(self) -> Iterator[model.Package]:
+        query = self._client_session.query(kind="packages")
+        for item in query.fetch(eventual=self._eventual):
+            yield self.entity_to_package(item)
+
+    def iterate_ids_without_weight_lbs(self) -> Iterator[str]:
+        query = self._client_session.query(kind="packages")
+        for item in query.fetch(eventual=self._eventual):
+            if item.get("weight_lbs") is None:
+                yield item.key.id
+
+    def iterate_unassigned(self) -> Iterator[model.Package]:
+        # Projects only the fields load planning needs. The results have
+        # no version, so they aren't meant to be written back.
+        query = self._client_session.query(
+            kind="packages",
+            projection=["shipping_type", "weight", "shipping_date"]
+        )
+        query.add_filter("carrier", "=", None)
+        for item in query.fetch(eventual=self._eventual):
+            item["carrier"] = None
+            yield self.entity_to_package(item)
 
     def remove(self, package_id: str):
-        package_key = self._client_session.key("packages", int(package_id))
+        package_key = self.key_for(package_id)
         result = self._client_session.get(key=package_key)
         if result:
             self._transaction.delete(package_key)
-            self._id_of_deleted_entity = result.id
\ No newline at end of file
+            self._id_of_deleted_entity = result.id
+
+    def key_for(self, package_id: str) -> datastore.Key:
+        return self._client_session.key("packages", int(package_id))
+
+    def package_to_entity(self, package: model.Package) -> datastore.Entity:
+        if package.package_id:
+            key = self.key_for(package.package_id)
+        else:
+            key = self._client_session.key("packages")
+
+        entity = self._datastore.Entity(key=key)
+        entity.update({
+            "shipping_type": package.shipping_type,
+            "weight": str(package.weight),
+            # weight is kept as an exact string; this copy is only there so
+            # packages can be filtered and sorted by weight in queries.
+            "weight_lbs": float(package.weight),
+            "shipping_date": str(package.shipping_date),
+            "carrier": package.carrier_id,
+            "version": package.version + 1,
+        })
+        package.version = entity["version"]
+        return entity
+
+    def to_property_value(self, value):
+        if isinstance(value, date):
+            return str(value)
+        if isinstance(value, Decimal):
+            return float(value)
+        return value
+
+    def entity_to_package(self, entity: datastore.Entity) -> model.Package:
+        shipping_date = datetime.strptime(
+            entity["shipping_date"], "%Y-%m-%d"
+        ).date()
+        return model.Package(
+            shipping_type=entity["shipping_type"],
+            weight=Decimal(entity["weight"]),
+            shipping_date=shipping_date,
+            carrier_id=entity["carrier"],
+            package_id=entity.key.id,
+            version=entity.get("version", 0)
+        )
\ No newline at end of file
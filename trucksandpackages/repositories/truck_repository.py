@@ -1,8 +1,11 @@
-from typing import List, Tuple
+from decimal import Decimal
+from typing import Iterator, List, Tuple
 
 from google.cloud import datastore
 from trucksandpackages.domain import model
-from trucksandpackages.repositories.abstract_repository import AbstractRepository
+from trucksandpackages.repositories.abstract_repository import (
+    AbstractRepository, MAX_KEYS_PER_LOOKUP
+)
 
 class TruckRepository(AbstractRepository):
 
@@ -10,11 +13,13 @@ class TruckRepository(AbstractRepository):
         self,
         client_session: datastore.Client,
         datastore_config: datastore,
-        transaction: datastore.Transaction
+        transaction: datastore.Transaction,
+        eventual: bool = False
     ):
         self._client_session = client_session
         self._datastore = datastore_config
         self._transaction = transaction
+        self._eventual = eventual
         self._added_entity: datastore.Entity = None
         self._id_of_deleted_entity: str = None
 
@@ -28,7 +33,7 @@ class TruckRepository(AbstractRepository):
 
     def add(self, truck: model.Truck):
         if truck.truck_id:
-            key = self._client_session.key("trucks", int(truck.truck_id))
+            key = self.key_for(truck.truck_id)
         else:
             key = self._client_session.key("trucks")
 
@@ -39,6 +44,11 @@ class TruckRepository(AbstractRepository):
             "axles": truck.axles,
             "owner": truck.owner,
             "packages": [],
+            "package_count": truck.package_count,
+            "total_weight": str(truck.total_weight),
+            "max_packages": truck.max_packages,
+            "max_weight": str(truck.max_weight) if truck.max_weight is not None else None,
+            "version": truck.version + 1,
         })
         if truck.has_packages():
             for package_id in truck.package_ids:
@@ -46,51 +56,135 @@ class TruckRepository(AbstractRepository):
 
         self._transaction.put(entity)
         self._added_entity = entity
+        truck.version = entity["version"]
 
 
-    def get(self, truck_id: str):
-        key = self._client_session.key("trucks", int(truck_id))
-        result = self._client_session.get(key=key)
+    def get(self, truck_id: str, fill_missing_totals: bool = True):
+        key = self.key_for(truck_id)
+        result = self._client_session.get(
+            key=key, transaction=self._transaction, eventual=self._eventual
+        )
         if result:
-            truck = model.Truck(
-                truck_type=result["type"],
-                truck_length=result["length"],
-                axles=result["axles"],
-                owner=result["owner"],
-                truck_id=result.key.id
-            )
-            for package_id in result["packages"]:
-                truck.assign_package_id(package_id)
+            truck = self.entity_to_truck(result)
+            if fill_missing_totals:
+                self.fill_missing_load_totals([truck])
             return truck
         else:
             return None
 
-    def get_list(self, limit: int, offset: int) -> Tuple[List[model.Truck], bool]:
+    def get_multi(self, truck_ids: List[str]) -> List[model.Truck]:
+        keys = [self.key_for(truck_id) for truck_id in truck_ids]
+        results = []
+        for start in range(0, len(keys), MAX_KEYS_PER_LOOKUP):
+            results.extend(
+                self._client_session.get_multi(
+                    keys[start:start + MAX_KEYS_PER_LOOKUP],
+                    transaction=self._transaction,
+                    eventual=self._eventual
+                )
+            )
+        trucks = [self.entity_to_truck(result) for result in results]
+        self.fill_missing_load_totals(trucks)
+        return trucks
+
+    def get_list(
+        self, limit: int, offset: int = 0, cursor: str = None, owner: str = None
+    ) -> Tuple[List[model.Truck], str]:
         query = self._client_session.query(kind="trucks")
-        query_iterator = query.fetch(limit=limit, offset=offset)
+        if owner is not None:
+            query.add_filter("owner", "=", owner)
+        query_iterator = query.fetch(
+            limit=limit,
+            offset=0 if cursor else offset,
+            start_cursor=cursor,
+            eventual=self._eventual
+        )
         pages = query_iterator.pages
         results = list(next(pages))
         trucks = []
         for item in results:
-            truck = model.Truck(
-                truck_type=item["type"],
-                truck_length=item["length"],
-                axles=item["axles"],
-                owner=item["owner"],
-                truck_id=item.key.id
-            )
-            for package_id in item["packages"]:
-                truck.assign_package_id(package_id)
-            trucks.append(truck)
+            trucks.append(self.entity_to_truck(item))
+        self.fill_missing_load_totals(trucks)
 
-        if query_iterator.next_page_token:
-            next_page_available = True
-        else:
-            next_page_available = False
-        return (trucks, next_page_available)
+        next_cursor = query_iterator.next_page_token
+        if isinstance(next_cursor, bytes):
+            next_cursor = next_cursor.decode("ascii")
+        return (trucks, next_cursor)
+
+    def iterate(self, owner: str = None) -> Iterator[model.Truck]:
+        query = self._client_session.query(kind="trucks")
+        if owner is not None:
+            query.add_filter("owner", "=", owner)
+        for item in query.fetch(eventual=self._eventual):
+            truck = self.entity_to_truck(item)
+            self.fill_missing_load_totals([truck])
+            yield truck
+
+    def iterate_ids(self) -> Iterator[str]:
+        query = self._client_session.query(kind="trucks")
+        query.keys_only()
+        for item in query.fetch(eventual=self._eventual):
+            yield item.key.id
 
     def remove(self, truck_id: str):
-        truck_key = self._client_session.key("trucks", int(truck_id))
+        truck_key = self.key_for(truck_id)
         result = self._client_session.get(key=truck_key)
         if result:
-            self._transaction.delete(truck_key)
\ No newline at end of file
+            self._transaction.delete(truck_key)
+
+    def key_for(self, truck_id: str) -> datastore.Key:
+        return self._client_session.key("trucks", int(truck_id))
+
+    def entity_to_truck(self, entity: datastore.Entity) -> model.Truck:
+        truck = model.Truck(
+            truck_type=entity["type"],
+            truck_length=entity["length"],
+            axles=entity["axles"],
+            owner=entity["owner"],
+            truck_id=entity.key.id,
+            version=entity.get("version", 0),
+            max_packages=entity.get("max_packages"),
+            max_weight=Decimal(entity["max_weight"]) if entity.get("max_weight") else None
+        )
+        for package_id in entity["packages"]:
+            truck.assign_package_id(package_id)
+        # Trucks saved before load totals were kept have no total_weight;
+        # None marks it as unknown until fill_missing_load_totals runs.
+        if entity.get("total_weight") is not None:
+            truck.total_weight = Decimal(entity["total_weight"])
+        else:
+            truck.total_weight = None
+        return truck
+
+    def fill_missing_load_totals(self, trucks: List[model.Truck]):
+        # Computes the load of trucks stored without totals from their
+        # packages, read the same way as the trucks were. The totals are
+        # saved the next time the truck is written.
+        trucks = [truck for truck in trucks if truck.total_weight is None]
+        if not trucks:
+            return
+        keys = [
+            self._client_session.key("packages", int(package_id))
+            for truck in trucks for package_id in truck.package_ids
+        ]
+        results = []
+        for start in range(0, len(keys), MAX_KEYS_PER_LOOKUP):
+            results.extend(
+                self._client_session.get_multi(
+                    keys[start:start + MAX_KEYS_PER_LOOKUP],
+                    transaction=self._transaction,
+                    eventual=self._eventual
+                )
+            )
+        packages = [
+            model.Package(
+                shipping_type=result["shipping_type"],
+                weight=Decimal(result["weight"]),
+                shipping_date=None,
+                package_id=result.key.id,
+                carrier_id=result["carrier"]
+            )
+            for result in results
+        ]
+        for truck in trucks:
+            truck.rebuild_load(packages)
\ No newline at end of file
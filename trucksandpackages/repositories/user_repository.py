@@ -1,6 +1,6 @@
 from trucksandpackages.repositories.abstract_repository import AbstractRepository
 
-from typing import List
+from typing import List, Tuple
 
 from google.cloud import datastore
 from trucksandpackages.domain import model
@@ -12,17 +12,19 @@ class UserRepository(AbstractRepository):
         self,
         client_session: datastore.Client,
         datastore_config: datastore,
-        transaction: datastore.Transaction
+        transaction: datastore.Transaction,
+        eventual: bool = False
     ):
         self._client_session = client_session
         self._datastore = datastore_config
         self._transaction = transaction
+        self._eventual = eventual
         self._added_entity: datastore.Entity = None
         self._id_of_deleted_entity: str = None
 
     @property
     def id_of_added_entity(self) -> str:
-        return self._added_entity.key.id
+        return self._added_entity.key.id_or_name
 
     @property
     def id_of_deleted_entity(self) -> str:
@@ -30,9 +32,11 @@ class UserRepository(AbstractRepository):
 
     def add(self, user: model.User):
         if user.user_id:
-            key = self._client_session.key("users", int(user.user_id))
+            key = self._client_session.key(
+                "users", self._key_id_or_name(user.user_id)
+            )
         else:
-            key = self._client_session.key("users")
+            key = self._client_session.key("users", user.auth_id)
 
         entity = self._datastore.Entity(key=key)
         entity.update({
@@ -48,31 +52,75 @@ class UserRepository(AbstractRepository):
 
 
     def get(self, user_id: str):
-        key = self._client_session.key("users", int(user_id))
-        result = self._client_session.get(key=key)
+        key = self._client_session.key("users", self._key_id_or_name(user_id))
+        result = self._client_session.get(
+            key=key, transaction=self._transaction, eventual=self._eventual
+        )
         if result:
-            user = model.User(
-                user_id=result.key.id
-            )
-            for truck_id in result["trucks"]:
-                user.assign_truck(truck_id)
-            return user
+            return self.entity_to_user(result)
+        else:
+            return None
+
+    def get_by_auth_id(self, auth_id: str) -> model.User:
+        key = self._client_session.key("users", auth_id)
+        result = self._client_session.get(
+            key=key, transaction=self._transaction, eventual=self._eventual
+        )
+        if not result:
+            # Users saved before they were keyed by auth_id have numeric
+            # IDs, so fall back to an equality filter on the property.
+            query = self._client_session.query(kind="users")
+            query.add_filter("auth_id", "=", auth_id)
+            results = list(query.fetch(limit=1, eventual=self._eventual))
+            result = results[0] if results else None
+        if result:
+            return self.entity_to_user(result)
         else:
             return None
 
     def get_list(self) -> List[model.User]:
         query = self._client_session.query(kind="users")
-        results = query.fetch()
+        results = query.fetch(eventual=self._eventual)
         users = []
         for item in results:
-            user = model.User(
-                auth_id=item["auth_id"],
-                user_id=item.key.id
-            )
-            for truck_id in item["trucks"]:
-                user.assign_truck(truck_id)
-            users.append(user)
+            users.append(self.entity_to_user(item))
         return users
 
+    def get_auth_ids(
+        self, limit: int, offset: int = 0, cursor: str = None
+    ) -> Tuple[List[str], str]:
+        # A projection query reads auth_id straight from the built-in
+        # index, without loading each user's list of trucks.
+        query = self._client_session.query(kind="users", projection=["auth_id"])
+        query_iterator = query.fetch(
+            limit=limit,
+            offset=0 if cursor else offset,
+            start_cursor=cursor,
+            eventual=self._eventual
+        )
+        pages = query_iterator.pages
+        auth_ids = [item["auth_id"] for item in next(pages)]
+
+        next_cursor = query_iterator.next_page_token
+        if isinstance(next_cursor, bytes):
+            next_cursor = next_cursor.decode("ascii")
+        return (auth_ids, next_cursor)
+
     def remove(self):
-        pass
\ No newline at end of file
+        pass
+
+    def _key_id_or_name(self, user_id):
+        # Users are keyed by their auth_id, except for older users that
+        # still have numeric IDs allocated by Datastore.
+        if isinstance(user_id, int) or user_id.isdigit():
+            return int(user_id)
+        return user_id
+
+    def entity_to_user(self, entity: datastore.Entity) -> model.User:
+        user = model.User(
+            auth_id=entity["auth_id"],
+            user_id=entity.key.id_or_name
+        )
+        for truck_id in entity["trucks"]:
+            user.assign_truck(truck_id)
+        return user
\ No newline at end of file
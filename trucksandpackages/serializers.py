@@ -0,0 +1,46 @@
+from typing import List, Set
+
+from trucksandpackages.domain import model
+
+def truck_to_dict(truck: model.Truck, self_link: str, packages_dict: List) -> dict:
+    return {
+        "id": truck.truck_id,
+        "type": truck.truck_type,
+        "length": truck.truck_length,
+        "axles": truck.axles,
+        "packages": packages_dict,
+        "package_count": truck.package_count,
+        "total_weight": truck.total_weight,
+        "max_packages": truck.max_packages,
+        "max_weight": truck.max_weight,
+        "owner": truck.owner,
+        "self": self_link
+    }
+
+def package_to_dict(package: model.Package, self_link: str, carrier_dict: dict) -> dict:
+    return {
+        "id": package.package_id,
+        "shipping_type": package.shipping_type,
+        "weight": package.weight,
+        "shipping_date": package.shipping_date,
+        "carrier": carrier_dict,
+        "self": self_link
+    }
+
+def create_list_of_package_dict(package_ids: Set[str], host_url: str) -> List:
+    return [package_link_to_dict(package_id, host_url) for package_id in package_ids]
+
+def package_link_to_dict(package_id: str, host_url: str) -> dict:
+    return {
+        "id": package_id,
+        "self": f"{host_url}/{package_id}"
+    }
+
+def carrier_to_dict(carrier_id: str, host_url: str) -> dict:
+    if carrier_id:
+        return {
+            "id": carrier_id,
+            "self": f"{host_url}/{carrier_id}"
+        }
+    else:
+        return None
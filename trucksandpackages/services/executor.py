@@ -0,0 +1,95 @@
+import concurrent.futures
+import os
+import threading
+import time
+from typing import Callable, List
+
+from trucksandpackages import exceptions
+
+# Bounds the threads this process spends on concurrent datastore reads,
+# however many requests are fanning out at once.
+MAX_WORKERS = 16
+
+# Seconds a fanned-out group of reads may take before the request gives up.
+DEFAULT_DEADLINE = 10
+
+# Long-running batch work, such as committing a load plan, gets a pool of its
+# own so it can't starve the reads that requests are waiting on.
+MAX_BATCH_WORKERS = 4
+
+_executor: concurrent.futures.ThreadPoolExecutor = None
+_batch_executor: concurrent.futures.ThreadPoolExecutor = None
+_executor_lock = threading.Lock()
+_worker_state = threading.local()
+
+def get_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """
+    Returns the thread pool shared by every request in this process for
+    fanning out independent reads, creating it on first use.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=MAX_WORKERS,
+                    thread_name_prefix="datastore",
+                    initializer=_mark_worker_thread
+                )
+    return _executor
+
+def get_batch_executor() -> concurrent.futures.ThreadPoolExecutor:
+    global _batch_executor
+    if _batch_executor is None:
+        with _executor_lock:
+            if _batch_executor is None:
+                _batch_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=MAX_BATCH_WORKERS,
+                    thread_name_prefix="datastore-batch"
+                )
+    return _batch_executor
+
+def _mark_worker_thread():
+    _worker_state.is_worker = True
+
+def _reset_executor():
+    # Worker threads don't survive a fork, so a forked worker starts its
+    # own pools on first use.
+    global _executor, _batch_executor, _executor_lock
+    _executor = None
+    _batch_executor = None
+    _executor_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_executor)
+
+def run_concurrently(
+    calls: List[Callable], deadline: float = DEFAULT_DEADLINE, batch: bool = False
+) -> List:
+    """
+    Runs each call on the shared pool, or the batch pool if `batch` is set,
+    and returns their results in order. Raises DeadlineExceededError if they
+    haven't all finished within `deadline` seconds, unless it's None, and
+    re-raises the first error any call raised.
+    """
+    if len(calls) == 1 or getattr(_worker_state, "is_worker", False):
+        # Work that's already on the pool runs its calls in place, since
+        # waiting on the pool from inside it could deadlock once it's full.
+        return [call() for call in calls]
+    pool = get_batch_executor() if batch else get_executor()
+    expires_at = None if deadline is None else time.monotonic() + deadline
+    futures = [pool.submit(call) for call in calls]
+    try:
+        return [
+            future.result(
+                timeout=None if expires_at is None
+                else max(expires_at - time.monotonic(), 0)
+            )
+            for future in futures
+        ]
+    except concurrent.futures.TimeoutError:
+        raise exceptions.DeadlineExceededError(
+            "The datastore didn't respond in time"
+        )
+    finally:
+        for future in futures:
+            future.cancel()
@@ -1,10 +1,64 @@
+import copy
+import functools
+import logging
 from datetime import date
 from decimal import Decimal
-from typing import List
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
-from trucksandpackages.domain import model
+from google.api_core import exceptions as api_exceptions
+
+from trucksandpackages import cache, exceptions
+from trucksandpackages.domain import model, planning
+from trucksandpackages.services import executor
 from trucksandpackages.services.unit_of_work import DatastoreUnitOfWork
 
+logger = logging.getLogger(__name__)
+
+# Datastore caps the number of entities a single commit can write.
+MAX_ENTITIES_PER_TRANSACTION = 500
+
+# A bulk assignment writes the truck along with each of its packages.
+MAX_PACKAGES_PER_BULK_ASSIGNMENT = MAX_ENTITIES_PER_TRANSACTION - 1
+
+# Keys per lookup when reads of many trucks or packages are fanned out.
+FAN_OUT_LOOKUP_SIZE = 50
+
+ASSIGNED = "assigned"
+UNASSIGNED = "unassigned"
+ALREADY_ON_TRUCK = "already_on_truck"
+ON_ANOTHER_TRUCK = "on_another_truck"
+NOT_ON_TRUCK = "not_on_truck"
+NOT_FOUND = "not_found"
+OVER_CAPACITY = "over_capacity"
+
+# Read-through caches for single truck and package reads. Write services
+# invalidate the entities they touch once their commit succeeds; the TTL
+# bounds how stale an entry cached by another worker process can get.
+ENTITY_CACHE_SIZE = 10000
+ENTITY_CACHE_TTL = 10
+truck_cache = cache.LRUCache(maxsize=ENTITY_CACHE_SIZE, ttl=ENTITY_CACHE_TTL)
+package_cache = cache.LRUCache(maxsize=ENTITY_CACHE_SIZE, ttl=ENTITY_CACHE_TTL)
+
+# Each worker logs its cache hit rates after this many cached lookups.
+CACHE_STATS_LOG_INTERVAL = 1000
+
+def get_entity_cache_stats() -> dict:
+    return {
+        "trucks": truck_cache.stats(),
+        "packages": package_cache.stats(),
+    }
+
+def _log_cache_stats(entity_cache: cache.LRUCache):
+    if (entity_cache.hits + entity_cache.misses) % CACHE_STATS_LOG_INTERVAL == 0:
+        logger.info("Entity cache stats: %s", get_entity_cache_stats())
+
+def _invalidate_trucks(truck_ids: Iterable[str]):
+    for truck_id in truck_ids:
+        truck_cache.pop(str(truck_id))
+
+def _invalidate_packages(package_ids: Iterable[str]):
+    for package_id in package_ids:
+        package_cache.pop(str(package_id))
 
 def create_truck_manager(auth_id: str, unit_of_work: DatastoreUnitOfWork):
     with unit_of_work:
@@ -15,45 +69,89 @@ def create_truck_manager(auth_id: str, unit_of_work: DatastoreUnitOfWork):
         return user_id
 
 
-def get_all_truck_managers(unit_of_work: DatastoreUnitOfWork) -> List[model.User]:
+def get_truck_manager_auth_ids(
+    query_limit: int,
+    query_offset: int,
+    unit_of_work: DatastoreUnitOfWork,
+    query_cursor: str = None
+) -> Tuple[List[str], str]:
     with unit_of_work:
-        truck_managers = unit_of_work.users.get_list()
-        return truck_managers
+        auth_ids, next_cursor = unit_of_work.users.get_auth_ids(
+            query_limit, query_offset, query_cursor
+        )
+        return (auth_ids, next_cursor)
 
 def get_truck_manager_by_auth_id(
     auth_id: str,
     unit_of_work: DatastoreUnitOfWork
 ) -> model.User:
     with unit_of_work:
-        users = unit_of_work.users.get_list()
-        for user in users:
-            if user.auth_id == auth_id:
-                return user
-        return None
+        return unit_of_work.users.get_by_auth_id(auth_id)
+
+def get_or_create_truck_manager(
+    auth_id: str,
+    unit_of_work: DatastoreUnitOfWork
+) -> str:
+    with unit_of_work:
+        user = unit_of_work.users.get_by_auth_id(auth_id)
+        if user:
+            return user.user_id
+        new_user = model.User(auth_id=auth_id)
+        unit_of_work.users.add(new_user)
+        unit_of_work.commit()
+        user_id = unit_of_work.users.id_of_added_entity
+        return user_id
 
 def create_truck(
     type: str,
     length: int,
     axles: int,
     auth_id: str,
-    unit_of_work: DatastoreUnitOfWork
+    unit_of_work: DatastoreUnitOfWork,
+    max_packages: int = None,
+    max_weight: Decimal = None
 ) -> str:
     with unit_of_work:
         new_truck = model.Truck(
-            type, length, axles, owner=auth_id
+            type,
+            length,
+            axles,
+            owner=auth_id,
+            max_packages=max_packages,
+            max_weight=max_weight
         )
         unit_of_work.trucks.add(new_truck)
         unit_of_work.commit()
         truck_id = unit_of_work.trucks.id_of_added_entity
         return truck_id
 
-def get_truck(truck_id: str, unit_of_work: DatastoreUnitOfWork) -> model.Truck:
+def get_truck(
+    truck_id: str,
+    unit_of_work: DatastoreUnitOfWork,
+    use_cache: bool = False
+) -> model.Truck:
+    if use_cache:
+        # Only an invalidation-free read may fill the cache, so a commit
+        # landing mid-read can't have its entity put back stale.
+        generation = truck_cache.generation
+        cached_truck = truck_cache.get(str(truck_id))
+        _log_cache_stats(truck_cache)
+        if cached_truck:
+            return copy.deepcopy(cached_truck)
     with unit_of_work:
         truck = unit_of_work.trucks.get(truck_id)
-        if truck:
-            return truck
-        else:
-            return None
+    if truck and use_cache:
+        truck_cache.set(str(truck_id), copy.deepcopy(truck), generation=generation)
+    return truck
+
+def get_trucks_by_ids(
+    truck_ids: List[str],
+    unit_of_work: DatastoreUnitOfWork
+) -> List[model.Truck]:
+    def get_trucks(truck_ids: List[str], unit_of_work: DatastoreUnitOfWork):
+        with unit_of_work:
+            return unit_of_work.trucks.get_multi(truck_ids)
+    return _get_multi_concurrently(get_trucks, truck_ids, unit_of_work)
 
 def edit_truck(
     truck: model.Truck,
@@ -61,16 +159,48 @@ def edit_truck(
     truck_type: str = None,
     truck_length: int = None,
     axles: int = None,
+    max_packages: int = None,
+    max_weight: Decimal = None,
     clear_package_ids: bool = False,
-):
+    clear_capacity: bool = False,
+    if_match_versions: Set[int] = None,
+) -> model.Truck:
+    # The edits are applied to the truck as read in this transaction, so
+    # its version and load can't be written over by the caller's copy.
     with unit_of_work:
-        truck.truck_type = truck_type if truck_type else truck.truck_type
-        truck.truck_length = truck_length if truck_length else truck.truck_length
-        truck.axles = axles if axles else truck.axles
+        current_truck = unit_of_work.trucks.get(truck.truck_id)
+        if not current_truck:
+            if if_match_versions is not None:
+                raise exceptions.VersionConflictError(
+                    "The truck has been modified since it was last read"
+                )
+            raise exceptions.EntityNotFoundError(
+                "No truck with this truck_id exists"
+            )
+        if if_match_versions is not None and \
+            current_truck.version not in if_match_versions:
+            raise exceptions.VersionConflictError(
+                "The truck has been modified since it was last read"
+            )
+        edited_truck = copy.copy(current_truck)
+        edited_truck.truck_type = truck_type if truck_type else current_truck.truck_type
+        edited_truck.truck_length = truck_length if truck_length else current_truck.truck_length
+        edited_truck.axles = axles if axles else current_truck.axles
+        if clear_capacity:
+            edited_truck.max_packages = None
+            edited_truck.max_weight = None
+        edited_truck.max_packages = max_packages if max_packages is not None else edited_truck.max_packages
+        edited_truck.max_weight = max_weight if max_weight is not None else edited_truck.max_weight
         if clear_package_ids:
-            truck.package_ids = set()
-        unit_of_work.trucks.add(truck)
+            edited_truck.unload_all_packages()
+        if not edited_truck.is_within_capacity():
+            raise exceptions.TruckCapacityExceededError(
+                "The truck's current load exceeds the requested capacity"
+            )
+        unit_of_work.trucks.add(edited_truck)
         unit_of_work.commit()
+    _invalidate_trucks([truck.truck_id])
+    return edited_truck
 
 def delete_truck(
     truck_id: str,
@@ -79,17 +209,259 @@ def delete_truck(
     with unit_of_work:
         unit_of_work.trucks.remove(truck_id)
         unit_of_work.commit()
+    _invalidate_trucks([truck_id])
+
+def unload_and_delete_truck(
+    truck: model.Truck,
+    unit_of_work: DatastoreUnitOfWork
+):
+    # Packages are unloaded in chunks that each fit in one transaction,
+    # so a truck carrying any number of packages can be deleted. Every
+    # chunk starts from the truck as read in its transaction, so packages
+    # assigned since the caller read it are unloaded too, and the truck is
+    # only removed by a transaction that finds it empty. That also makes a
+    # retry after a failure part way through safe.
+    while True:
+        with unit_of_work:
+            current_truck = unit_of_work.trucks.get(truck.truck_id)
+            if not current_truck:
+                break
+            chunk = list(current_truck.package_ids)[:MAX_PACKAGES_PER_BULK_ASSIGNMENT]
+            if not chunk:
+                unit_of_work.trucks.remove(truck.truck_id)
+                unit_of_work.commit()
+                break
+            packages = unit_of_work.packages.get_multi(chunk)
+            unloaded_packages = []
+            for package in packages:
+                if package.carrier_id == current_truck.truck_id:
+                    current_truck.unload_package(package)
+                    package.carrier_id = None
+                    unloaded_packages.append(package)
+            for package_id in chunk:
+                current_truck.unassign_package_id(package_id)
+            unit_of_work.packages.add_multi(unloaded_packages)
+            unit_of_work.trucks.add(current_truck)
+            unit_of_work.commit()
+        _invalidate_packages(package.package_id for package in unloaded_packages)
+        _invalidate_trucks([truck.truck_id])
+    _invalidate_trucks([truck.truck_id])
 
 def get_trucks(
     query_limit: int,
-    query_offset: str,
+    query_offset: int,
+    unit_of_work: DatastoreUnitOfWork,
+    query_cursor: str = None,
+    owner: str = None
+):
+    with unit_of_work:
+        trucks, next_cursor = unit_of_work.trucks.get_list(
+            query_limit, query_offset, query_cursor, owner
+        )
+        return (trucks, next_cursor)
+
+def assign_package_to_truck(
+    truck_id: str,
+    package_id: str,
+    auth_id: str,
     unit_of_work: DatastoreUnitOfWork
 ):
     with unit_of_work:
-        trucks, next_page_available = unit_of_work.trucks.get_list(
-            query_limit, query_offset
+        truck, package = unit_of_work.get_truck_and_package(truck_id, package_id)
+        _check_truck_and_package(truck, package, auth_id)
+        if package.carrier_id and package.carrier_id != truck.truck_id:
+            raise exceptions.PackageAlreadyAssignedError(
+                "The package is already loaded on another truck"
+            )
+        if not truck.has_capacity_for([package]):
+            raise exceptions.TruckCapacityExceededError(
+                "Loading the package would exceed the truck's capacity"
+            )
+        truck.load_package(package)
+        package.carrier_id = truck.truck_id
+        unit_of_work.trucks.add(truck)
+        unit_of_work.packages.add(package)
+        unit_of_work.commit()
+    _invalidate_trucks([truck_id])
+    _invalidate_packages([package_id])
+
+def unassign_package_from_truck(
+    truck_id: str,
+    package_id: str,
+    auth_id: str,
+    unit_of_work: DatastoreUnitOfWork
+):
+    with unit_of_work:
+        truck, package = unit_of_work.get_truck_and_package(truck_id, package_id)
+        _check_truck_and_package(truck, package, auth_id)
+        if package.package_id not in truck.package_ids:
+            raise exceptions.PackageNotAssignedError(
+                "No truck with this truck_id is loaded with the package with this package_id"
+            )
+        truck.unload_package(package)
+        package.carrier_id = None
+        unit_of_work.trucks.add(truck)
+        unit_of_work.packages.add(package)
+        unit_of_work.commit()
+    _invalidate_trucks([truck_id])
+    _invalidate_packages([package_id])
+
+def assign_packages_to_truck(
+    truck_id: str,
+    package_ids: List[str],
+    auth_id: str,
+    unit_of_work: DatastoreUnitOfWork
+) -> Dict[str, str]:
+    with unit_of_work:
+        truck, packages = unit_of_work.get_truck_and_packages(
+            truck_id, package_ids
         )
-        return (trucks, next_page_available)
+        _check_truck_owner(truck, auth_id)
+        packages_by_id = {str(package.package_id): package for package in packages}
+        outcomes = {}
+        assigned_packages = []
+        for package_id in package_ids:
+            package = packages_by_id.get(str(package_id))
+            if not package:
+                outcomes[package_id] = NOT_FOUND
+            elif package.carrier_id == truck.truck_id:
+                outcomes[package_id] = ALREADY_ON_TRUCK
+            elif package.carrier_id:
+                outcomes[package_id] = ON_ANOTHER_TRUCK
+            else:
+                assigned_packages.append(package)
+                outcomes[package_id] = ASSIGNED
+        if not truck.has_capacity_for(assigned_packages):
+            raise exceptions.TruckCapacityExceededError(
+                "Loading these packages would exceed the truck's capacity"
+            )
+        for package in assigned_packages:
+            truck.load_package(package)
+            package.carrier_id = truck.truck_id
+        if assigned_packages:
+            unit_of_work.trucks.add(truck)
+            unit_of_work.packages.add_multi(assigned_packages)
+            unit_of_work.commit()
+    _invalidate_trucks([truck_id])
+    _invalidate_packages(package.package_id for package in assigned_packages)
+    return outcomes
+
+def unassign_packages_from_truck(
+    truck_id: str,
+    package_ids: List[str],
+    auth_id: str,
+    unit_of_work: DatastoreUnitOfWork
+) -> Dict[str, str]:
+    with unit_of_work:
+        truck, packages = unit_of_work.get_truck_and_packages(
+            truck_id, package_ids
+        )
+        _check_truck_owner(truck, auth_id)
+        packages_by_id = {str(package.package_id): package for package in packages}
+        outcomes = {}
+        unassigned_packages = []
+        for package_id in package_ids:
+            package = packages_by_id.get(str(package_id))
+            if not package:
+                outcomes[package_id] = NOT_FOUND
+            elif package.package_id not in truck.package_ids:
+                outcomes[package_id] = NOT_ON_TRUCK
+            else:
+                truck.unload_package(package)
+                package.carrier_id = None
+                unassigned_packages.append(package)
+                outcomes[package_id] = UNASSIGNED
+        if unassigned_packages:
+            unit_of_work.trucks.add(truck)
+            unit_of_work.packages.add_multi(unassigned_packages)
+            unit_of_work.commit()
+    _invalidate_trucks([truck_id])
+    _invalidate_packages(package.package_id for package in unassigned_packages)
+    return outcomes
+
+def get_trucks_for_owner(
+    auth_id: str,
+    unit_of_work: DatastoreUnitOfWork
+) -> List[model.Truck]:
+    with unit_of_work:
+        return list(unit_of_work.trucks.iterate(auth_id))
+
+def get_unassigned_packages(
+    unit_of_work: DatastoreUnitOfWork
+) -> List[model.Package]:
+    with unit_of_work:
+        return list(unit_of_work.packages.iterate_unassigned())
+
+def plan_truck_loads(
+    auth_id: str,
+    trucks_unit_of_work: DatastoreUnitOfWork,
+    packages_unit_of_work: DatastoreUnitOfWork
+) -> planning.LoadPlan:
+    # The manager's trucks and the unassigned packages are read concurrently,
+    # each with its own unit of work. Planning reads every unassigned
+    # package, so the reads run as batch work rather than under the
+    # deadline meant for reads serving a single page.
+    trucks, packages = executor.run_concurrently(
+        [
+            functools.partial(get_trucks_for_owner, auth_id, trucks_unit_of_work),
+            functools.partial(get_unassigned_packages, packages_unit_of_work)
+        ],
+        deadline=None,
+        batch=True
+    )
+    return planning.plan_loads(trucks, packages)
+
+def commit_load_plan(
+    load_plan: planning.LoadPlan,
+    auth_id: str,
+    unit_of_work: DatastoreUnitOfWork
+) -> Dict[str, str]:
+    # Each truck's packages are assigned in batches that fit in one
+    # transaction. Assignment re-checks every package and the truck's
+    # capacity, so packages taken by someone else since planning are
+    # reported rather than moved.
+    outcomes = {}
+    for truck_id, package_ids in load_plan.assignments.items():
+        package_ids = [str(package_id) for package_id in package_ids]
+        for start in range(0, len(package_ids), MAX_PACKAGES_PER_BULK_ASSIGNMENT):
+            batch = package_ids[start:start + MAX_PACKAGES_PER_BULK_ASSIGNMENT]
+            try:
+                outcomes.update(
+                    assign_packages_to_truck(truck_id, batch, auth_id, unit_of_work)
+                )
+            except exceptions.TruckCapacityExceededError:
+                outcomes.update({package_id: OVER_CAPACITY for package_id in batch})
+            except (exceptions.EntityNotFoundError, exceptions.NotOwnerError):
+                outcomes.update({package_id: NOT_FOUND for package_id in batch})
+    return outcomes
+
+def _check_truck_owner(truck: model.Truck, auth_id: str):
+    if not truck:
+        raise exceptions.EntityNotFoundError(
+            "No truck with this truck_id exists"
+        )
+    if truck.owner != auth_id:
+        raise exceptions.NotOwnerError(
+            "The truck is owned by another truck manager"
+        )
+
+def _check_truck_and_package(
+    truck: model.Truck, package: model.Package, auth_id: str
+):
+    if not truck or not package:
+        raise exceptions.EntityNotFoundError(
+            "The specified truck and/or package does not exist"
+        )
+    if truck.owner != auth_id:
+        raise exceptions.NotOwnerError(
+            "The truck is owned by another truck manager"
+        )
+
+def iterate_trucks(
+    unit_of_work: DatastoreUnitOfWork, owner: str = None
+) -> Iterator[model.Truck]:
+    with unit_of_work:
+        yield from unit_of_work.trucks.iterate(owner)
 
 def create_package(
     shipping_type: str,
@@ -106,24 +478,126 @@ def create_package(
         package_id = unit_of_work.packages.id_of_added_entity
         return package_id
 
+def create_packages(
+    package_values: List[Tuple[str, Decimal, date]],
+    unit_of_work: DatastoreUnitOfWork
+) -> List[Optional[str]]:
+    package_ids = []
+    for start in range(0, len(package_values), MAX_ENTITIES_PER_TRANSACTION):
+        chunk = package_values[start:start + MAX_ENTITIES_PER_TRANSACTION]
+        try:
+            with unit_of_work:
+                chunk_ids = unit_of_work.packages.allocate_ids(len(chunk))
+                new_packages = [
+                    model.Package(
+                        shipping_type,
+                        weight,
+                        shipping_date,
+                        package_id=package_id,
+                        carrier_id=None
+                    )
+                    for (shipping_type, weight, shipping_date), package_id
+                    in zip(chunk, chunk_ids)
+                ]
+                unit_of_work.packages.add_multi(new_packages)
+                unit_of_work.commit()
+        except api_exceptions.GoogleAPIError:
+            # Earlier chunks have already committed, so a failed chunk only
+            # fails its own packages, which get None in place of an id.
+            logger.exception(
+                "Unable to create packages %d to %d", start, start + len(chunk) - 1
+            )
+            package_ids.extend([None] * len(chunk))
+            continue
+        package_ids.extend(chunk_ids)
+    return package_ids
+
 def get_packages(
     query_limit: int,
-    query_offset: str,
-    unit_of_work: DatastoreUnitOfWork
+    query_offset: int,
+    unit_of_work: DatastoreUnitOfWork,
+    query_cursor: str = None,
+    filters: dict = None,
+    sort: str = None
 ):
     with unit_of_work:
-        packages, next_page_available = unit_of_work.packages.get_list(
-            query_limit, query_offset
+        packages, next_cursor = unit_of_work.packages.get_list(
+            query_limit, query_offset, query_cursor, filters, sort
         )
-        return (packages, next_page_available)
+        return (packages, next_cursor)
 
-def get_package(package_id: str, unit_of_work: DatastoreUnitOfWork) -> model.Package:
+def iterate_packages(
+    unit_of_work: DatastoreUnitOfWork
+) -> Iterator[model.Package]:
+    with unit_of_work:
+        yield from unit_of_work.packages.iterate()
+
+def backfill_package_weights(unit_of_work: DatastoreUnitOfWork) -> int:
+    # Rewrites packages saved before weight_lbs existed, so they show up in
+    # weight filters and weight-sorted listings. Returns how many it wrote.
+    reader_unit_of_work = DatastoreUnitOfWork(read_only=True, eventual=True)
+    with reader_unit_of_work:
+        package_ids = [
+            str(package_id) for package_id
+            in reader_unit_of_work.packages.iterate_ids_without_weight_lbs()
+        ]
+    for start in range(0, len(package_ids), MAX_ENTITIES_PER_TRANSACTION):
+        chunk = package_ids[start:start + MAX_ENTITIES_PER_TRANSACTION]
+        with unit_of_work:
+            packages = unit_of_work.packages.get_multi(chunk)
+            unit_of_work.packages.add_multi(packages)
+            unit_of_work.commit()
+        _invalidate_packages(chunk)
+    return len(package_ids)
+
+def get_packages_by_ids(
+    package_ids: List[str],
+    unit_of_work: DatastoreUnitOfWork
+) -> List[model.Package]:
+    def get_packages(package_ids: List[str], unit_of_work: DatastoreUnitOfWork):
+        with unit_of_work:
+            return unit_of_work.packages.get_multi(package_ids)
+    return _get_multi_concurrently(get_packages, package_ids, unit_of_work)
+
+def _get_multi_concurrently(
+    get_multi: Callable,
+    ids: List[str],
+    unit_of_work: DatastoreUnitOfWork
+) -> List:
+    # Lookups outside a transaction are split into small chunks that are
+    # read in parallel, each with its own unit of work, so a page expanding
+    # hundreds of entities waits on one small lookup's latency rather than
+    # one large lookup's. Transactional reads stay on the one transaction.
+    if not unit_of_work.read_only or len(ids) <= FAN_OUT_LOOKUP_SIZE:
+        return get_multi(ids, unit_of_work)
+    chunk_results = executor.run_concurrently([
+        functools.partial(
+            get_multi,
+            ids[start:start + FAN_OUT_LOOKUP_SIZE],
+            DatastoreUnitOfWork(read_only=True, eventual=unit_of_work.eventual)
+        )
+        for start in range(0, len(ids), FAN_OUT_LOOKUP_SIZE)
+    ])
+    return [entity for chunk in chunk_results for entity in chunk]
+
+def get_package(
+    package_id: str,
+    unit_of_work: DatastoreUnitOfWork,
+    use_cache: bool = False
+) -> model.Package:
+    if use_cache:
+        generation = package_cache.generation
+        cached_package = package_cache.get(str(package_id))
+        _log_cache_stats(package_cache)
+        if cached_package:
+            return copy.deepcopy(cached_package)
     with unit_of_work:
         package = unit_of_work.packages.get(package_id)
-        if package:
-            return package
-        else:
-            return None
+    if package and use_cache:
+        package_cache.set(
+            str(package_id), copy.deepcopy(package), generation=generation
+        )
+    return package
 
 def edit_package(
     package: model.Package,
@@ -132,24 +606,113 @@ def edit_package(
     weight: Decimal = None,
     shipping_date: date = None,
     clear_carrier: bool = False,
-):
+    if_match_versions: Set[int] = None,
+) -> model.Package:
+    # The edits are applied to the package as read in this transaction,
+    # so an assignment made since the caller read it isn't written over.
+    carrier = None
     with unit_of_work:
-        package.shipping_type = shipping_type if shipping_type else package.shipping_type
-        package.weight = weight if weight else package.weight
-        package.shipping_date = shipping_date if shipping_date else package.shipping_date
+        current_package = unit_of_work.packages.get(package.package_id)
+        if not current_package:
+            if if_match_versions is not None:
+                raise exceptions.VersionConflictError(
+                    "The package has been modified since it was last read"
+                )
+            raise exceptions.EntityNotFoundError(
+                "No package with this package_id exists"
+            )
+        if if_match_versions is not None and \
+            current_package.version not in if_match_versions:
+            raise exceptions.VersionConflictError(
+                "The package has been modified since it was last read"
+            )
+        edited_package = copy.copy(current_package)
+        edited_package.shipping_type = shipping_type if shipping_type else current_package.shipping_type
+        edited_package.weight = weight if weight else current_package.weight
+        edited_package.shipping_date = shipping_date if shipping_date else current_package.shipping_date
+
+        # The carrier's load totals are kept in step with the package in
+        # the same transaction.
+        if current_package.carrier_id:
+            carrier = unit_of_work.trucks.get(current_package.carrier_id)
+        if carrier:
+            if clear_carrier:
+                carrier.unload_package(current_package)
+            else:
+                carrier.change_package_weight(
+                    current_package.package_id,
+                    current_package.weight,
+                    edited_package.weight
+                )
+                if edited_package.weight > current_package.weight and \
+                    not carrier.is_within_capacity():
+                    raise exceptions.TruckCapacityExceededError(
+                        "The new weight would exceed the carrier truck's capacity"
+                    )
+            unit_of_work.trucks.add(carrier)
         if clear_carrier:
-            package.carrier_id = None
-        unit_of_work.packages.add(package)
+            edited_package.carrier_id = None
+        unit_of_work.packages.add(edited_package)
         unit_of_work.commit()
+    _invalidate_packages([edited_package.package_id])
+    if carrier:
+        _invalidate_trucks([carrier.truck_id])
+    return edited_package
 
 def delete_package(
     package_id: str,
     unit_of_work: DatastoreUnitOfWork
 ):
+    carrier = None
     with unit_of_work:
+        package = unit_of_work.packages.get(package_id)
+        if package and package.carrier_id:
+            carrier = unit_of_work.trucks.get(package.carrier_id)
+        if carrier:
+            carrier.unload_package(package)
+            unit_of_work.trucks.add(carrier)
         unit_of_work.packages.remove(package_id)
         unit_of_work.commit()
-        if unit_of_work.packages.id_of_deleted_entity:
-            return True
-        else:
-            return False
\ No newline at end of file
+    _invalidate_packages([package_id])
+    if carrier:
+        _invalidate_trucks([carrier.truck_id])
+    if unit_of_work.packages.id_of_deleted_entity:
+        return True
+    else:
+        return False
+
+def rebuild_truck_load(
+    truck_id: str,
+    unit_of_work: DatastoreUnitOfWork
+) -> bool:
+    # Rebuilds a truck's package_ids and load totals from the packages that
+    # are actually carried by it, and saves them. Returns whether anything
+    # had drifted from what was stored, which includes a missing total.
+    with unit_of_work:
+        truck = unit_of_work.trucks.get(truck_id, fill_missing_totals=False)
+        if not truck:
+            raise exceptions.EntityNotFoundError(
+                "No truck with this truck_id exists"
+            )
+        packages = unit_of_work.packages.get_multi(
+            [str(package_id) for package_id in truck.package_ids]
+        )
+        recorded_package_ids = set(truck.package_ids)
+        recorded_total_weight = truck.total_weight
+        truck.rebuild_load(packages)
+        unit_of_work.trucks.add(truck)
+        unit_of_work.commit()
+    _invalidate_trucks([truck_id])
+    return truck.package_ids != recorded_package_ids or \
+        truck.total_weight != recorded_total_weight
+
+def rebuild_all_truck_loads(unit_of_work: DatastoreUnitOfWork) -> List[str]:
+    reader_unit_of_work = DatastoreUnitOfWork(read_only=True, eventual=True)
+    with reader_unit_of_work:
+        truck_ids = [
+            str(truck_id) for truck_id in reader_unit_of_work.trucks.iterate_ids()
+        ]
+    return [
+        truck_id for truck_id in truck_ids
+        if rebuild_truck_load(truck_id, unit_of_work)
+    ]
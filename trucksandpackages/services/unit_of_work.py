@@ -1,40 +1,118 @@
+import os
+import threading
+
 from google.cloud import datastore
 
+from typing import List, Tuple
+
+from trucksandpackages.domain import model
 from trucksandpackages.repositories.truck_repository import TruckRepository
 from trucksandpackages.repositories.user_repository import UserRepository
 from trucksandpackages.repositories.package_repository import PackageRepository
 
+_client: datastore.Client = None
+_client_lock = threading.Lock()
+
+def get_client() -> datastore.Client:
+    """
+    Returns the datastore client shared by every unit of work in this
+    process, creating it on first use. The client holds the credentials
+    and the pooled gRPC channel, so building it once per worker avoids
+    repeating that setup for every unit of work.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = datastore.Client()
+    return _client
+
+def _reset_client():
+    # gRPC channels can't be shared across a fork, so a forked worker
+    # builds its own client on first use.
+    global _client, _client_lock
+    _client = None
+    _client_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_client)
+
 class DatastoreUnitOfWork:
+    """
+    By default every `with` block runs inside a datastore transaction.
+    A read-only unit of work skips the transaction's begin and rollback
+    RPCs and reads straight from the client, either strongly consistent
+    or, with `eventual=True`, eventually consistent. Its repositories
+    can't write and it can't be committed.
+    """
 
-    def __init__(self):
+    def __init__(self, read_only: bool = False, eventual: bool = False):
         self.datastore = datastore
+        self.read_only = read_only
+        self.eventual = eventual if read_only else False
 
     def __enter__(self):
-        self.client_session = datastore.Client()
-        self.transaction = self.client_session.transaction()
-        self.transaction.begin()
+        self.client_session = get_client()
+        if self.read_only:
+            self.transaction = None
+        else:
+            self.transaction = self.client_session.transaction()
+            self.transaction.begin()
         self.users = UserRepository(
             self.client_session,
             self.datastore,
-            self.transaction
+            self.transaction,
+            self.eventual
         )
         self.trucks = TruckRepository(
             self.client_session,
             self.datastore,
-            self.transaction
+            self.transaction,
+            self.eventual
         )
         self.packages = PackageRepository(
             self.client_session,
             self.datastore,
-            self.transaction
+            self.transaction,
+            self.eventual
         )
 
     def __exit__(self, *args):
         self.rollback()
 
+    def get_truck_and_package(
+        self, truck_id: str, package_id: str
+    ) -> Tuple[model.Truck, model.Package]:
+        truck, packages = self.get_truck_and_packages(truck_id, [package_id])
+        return (truck, packages[0] if packages else None)
+
+    def get_truck_and_packages(
+        self, truck_id: str, package_ids: List[str]
+    ) -> Tuple[model.Truck, List[model.Package]]:
+        truck_key = self.trucks.key_for(truck_id)
+        package_keys = [
+            self.packages.key_for(package_id) for package_id in package_ids
+        ]
+        results = self.client_session.get_multi(
+            [truck_key] + package_keys,
+            transaction=self.transaction,
+            eventual=self.eventual
+        )
+        truck, packages = None, []
+        for entity in results:
+            if entity.key == truck_key:
+                truck = self.trucks.entity_to_truck(entity)
+            else:
+                packages.append(self.packages.entity_to_package(entity))
+        if truck:
+            self.trucks.fill_missing_load_totals([truck])
+        return (truck, packages)
+
     def commit(self):
+        if self.read_only:
+            raise RuntimeError("A read-only unit of work can't be committed")
         self.transaction.commit()
 
     def rollback(self):
-        if self.transaction._status == self.transaction._IN_PROGRESS:
+        if self.transaction and \
+            self.transaction._status == self.transaction._IN_PROGRESS:
             self.transaction.rollback()
\ No newline at end of file
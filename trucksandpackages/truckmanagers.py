@@ -1,14 +1,13 @@
 from flask import Blueprint, jsonify, request
 
-from trucksandpackages.domain import model
 from trucksandpackages import common
 from trucksandpackages.services import services, unit_of_work
 
 bp = Blueprint("truckmanagers", __name__, url_prefix="/truckmanagers")
 
-def truck_manager_to_dict(user: model.User):
+def truck_manager_to_dict(auth_id: str):
     return {
-        "auth_id": user.auth_id
+        "auth_id": auth_id
     }
 
 @bp.route("", methods=["GET"])
@@ -20,15 +19,26 @@ def get_all_truck_managers():
         if response_406_error:
             return response_406_error
 
-        truck_managers = services.get_all_truck_managers(
-            unit_of_work.DatastoreUnitOfWork()
+        response_400_error = common.check_for_pagination_error_400(request)
+        if response_400_error:
+            return response_400_error
+
+        query_offset = int(request.args.get("offset", "0"))
+        query_limit = common.get_page_limit(request)
+        query_cursor = request.args.get("cursor", None)
+        auth_ids, next_cursor = services.get_truck_manager_auth_ids(
+            query_limit,
+            query_offset,
+            unit_of_work.DatastoreUnitOfWork(read_only=True, eventual=True),
+            query_cursor=query_cursor
         )
         response_200 = jsonify(
             {
                 "users": [
-                    truck_manager_to_dict(manager) for manager in truck_managers
-                ]
+                    truck_manager_to_dict(auth_id) for auth_id in auth_ids
+                ],
+                "next": common.next_page_url(request, query_limit, next_cursor) if next_cursor else None
             }
         )
         response_200.status_code = 200
-        return response_200
\ No newline at end of file
+        return response_200
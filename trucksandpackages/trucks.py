@@ -1,13 +1,18 @@
-from typing import List, Set
-from flask import Blueprint, jsonify, make_response, request
-
-from trucksandpackages import auth, common, exceptions
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Set
+from flask import (
+    Blueprint, Response, jsonify, make_response, request, stream_with_context
+)
+from flask import json as flask_json
+
+from trucksandpackages import auth, common, exceptions, serializers
 from trucksandpackages.services import services, unit_of_work
 from trucksandpackages.domain import model
 
 bp = Blueprint("trucks", __name__, url_prefix="/trucks")
 
 CREATE_TRUCK_REQUIRED_VALUES = ["type", "length", "axles"]
+TRUCK_CAPACITY_VALUES = ["max_packages", "max_weight"]
 
 def has_required_values_for_create_truck(json_data: dict) -> bool:
     for value in CREATE_TRUCK_REQUIRED_VALUES:
@@ -15,32 +20,87 @@ def has_required_values_for_create_truck(json_data: dict) -> bool:
             return False
     return True
 
-def truck_to_dict(truck: model.Truck, self_link: str, packages_dict: List) -> dict:
-    return {
-        "id": truck.truck_id,
-        "type": truck.truck_type,
-        "length": truck.truck_length,
-        "axles": truck.axles,
-        "packages": packages_dict,
-        "owner": truck.owner,
-        "self": self_link
-    }
-
-def create_list_of_package_dict(package_ids: Set[str], host_url: str) -> List:
-    return [package_to_dict(package_id, host_url) for package_id in package_ids]
-
-def package_to_dict(package_id: str, host_url: str):
-    return {
-        "id": package_id,
-        "self": f"{host_url}/{package_id}"
-    }
+def get_packages_by_id(trucks: List[model.Truck]) -> Dict[str, model.Package]:
+    package_ids = set()
+    for truck in trucks:
+        package_ids.update(str(package_id) for package_id in truck.package_ids)
+    if not package_ids:
+        return {}
+    truck_packages = services.get_packages_by_ids(
+        list(package_ids),
+        unit_of_work.DatastoreUnitOfWork(read_only=True, eventual=True)
+    )
+    return {str(package.package_id): package for package in truck_packages}
+
+def create_list_of_expanded_package_dict(
+    package_ids: Set[str],
+    packages_by_id: Dict[str, model.Package],
+    host_url: str
+) -> List:
+    expanded_packages = []
+    for package_id in package_ids:
+        package = packages_by_id.get(str(package_id))
+        if package:
+            expanded_packages.append(
+                serializers.package_to_dict(
+                    package,
+                    f"{host_url}packages/{package_id}",
+                    serializers.carrier_to_dict(package.carrier_id, f"{host_url}trucks")
+                )
+            )
+    return expanded_packages
+
+def create_packages_dict_for_truck(
+    truck: model.Truck,
+    packages_by_id: Dict[str, model.Package],
+    host_url: str
+) -> List:
+    if packages_by_id is None:
+        return serializers.create_list_of_package_dict(truck.package_ids, f"{host_url}packages")
+    else:
+        return create_list_of_expanded_package_dict(
+            truck.package_ids, packages_by_id, host_url
+        )
 
 def contains_unallowed_attributes(json_data: dict) -> bool:
     for key in json_data:
-        if key not in CREATE_TRUCK_REQUIRED_VALUES:
+        if key not in CREATE_TRUCK_REQUIRED_VALUES + TRUCK_CAPACITY_VALUES:
             return True
     return False
 
+def parse_truck_capacity(json_data: dict) -> tuple:
+    max_packages = json_data.get("max_packages", None)
+    max_weight = json_data.get("max_weight", None)
+    if max_packages is not None and (
+        not isinstance(max_packages, int) or isinstance(max_packages, bool)
+        or max_packages < 0
+    ):
+        raise ValueError("max_packages must be a non-negative integer")
+    if max_weight is not None:
+        try:
+            max_weight = Decimal(str(max_weight))
+        except InvalidOperation:
+            max_weight = None
+        if isinstance(json_data["max_weight"], bool) or max_weight is None \
+            or not max_weight.is_finite() or max_weight < 0:
+            raise ValueError("max_weight must be a non-negative number")
+    return (max_packages, max_weight)
+
+def get_package_ids_for_bulk_assignment(json_data) -> List[str]:
+    if not isinstance(json_data, dict) or \
+        not isinstance(json_data.get("package_ids"), list):
+        return None
+    package_ids = []
+    for package_id in json_data["package_ids"]:
+        if not str(package_id).isdigit():
+            return None
+        if str(package_id) not in package_ids:
+            package_ids.append(str(package_id))
+    if not package_ids or \
+        len(package_ids) > services.MAX_PACKAGES_PER_BULK_ASSIGNMENT:
+        return None
+    return package_ids
+
 @bp.route("", methods=["POST", "GET"])
 def create_truck():
     try:
@@ -69,14 +129,27 @@ def create_truck():
             })
             response_400_error.status_code = 400
             return response_400_error
-        
+
+        try:
+            max_packages, max_weight = parse_truck_capacity(json_data)
+        except ValueError as e:
+            response_400_error = jsonify({"Error": str(e)})
+            response_400_error.status_code = 400
+            return response_400_error
+
         truck_type = json_data["type"]
         length = json_data["length"]
         axles = json_data["axles"]
         auth_id = payload["sub"]
 
         truck_id = services.create_truck(
-            truck_type, length, axles, auth_id, unit_of_work.DatastoreUnitOfWork()
+            truck_type,
+            length,
+            axles,
+            auth_id,
+            unit_of_work.DatastoreUnitOfWork(),
+            max_packages=max_packages,
+            max_weight=max_weight
         )
         response_201 = make_response(
             jsonify({
@@ -85,6 +158,10 @@ def create_truck():
                 "length": length,
                 "axles": axles,
                 "packages": [],
+                "package_count": 0,
+                "total_weight": "0",
+                "max_packages": max_packages,
+                "max_weight": max_weight,
                 "owner": auth_id,
                 "self": f"{request.base_url}/{truck_id}"
             })
@@ -99,27 +176,126 @@ def create_truck():
         if response_406_error:
             return response_406_error
 
+        response_400_error = common.check_for_pagination_error_400(request)
+        if response_400_error:
+            return response_400_error
+
         query_offset = int(request.args.get("offset", "0"))
-        query_limit = 5
-        trucks, next_page_available = services.get_trucks(
-            query_limit, query_offset, unit_of_work.DatastoreUnitOfWork()
+        query_limit = common.get_page_limit(request)
+        query_cursor = request.args.get("cursor", None)
+        trucks, next_cursor = services.get_trucks(
+            query_limit,
+            query_offset,
+            unit_of_work.DatastoreUnitOfWork(read_only=True, eventual=True),
+            query_cursor=query_cursor,
+            owner=payload["sub"]
         )
+        packages_by_id = None
+        if "packages" in common.get_expand_values(request):
+            packages_by_id = get_packages_by_id(trucks)
         response_200 = jsonify(
             {
                 "trucks": [
-                    truck_to_dict(
+                    serializers.truck_to_dict(
                         truck,
                         f"{request.base_url}",
-                        create_list_of_package_dict(truck.package_ids, f"{request.host_url}packages")
+                        create_packages_dict_for_truck(
+                            truck, packages_by_id, request.host_url
+                        )
                     ) for truck in trucks
                 ],
-                "next": f"{request.base_url}?limit=5&offset={query_offset + query_limit}" if next_page_available else None
+                "next": common.next_page_url(request, query_limit, next_cursor) if next_cursor else None
             }
         )
         response_200.status_code = 200
         return response_200
 
 
+@bp.route("/export", methods=["GET"])
+def export_trucks():
+    try:
+        payload = auth.verify_jwt(request)
+    except (exceptions.NoAuthHeaderError, exceptions.InvalidHeaderError) as e:
+        response_401_error = make_response(e.error)
+        response_401_error.status_code = e.status_code
+        return response_401_error
+
+    response_406_error = common.check_for_accept_error_406(
+        request, ["application/x-ndjson"]
+    )
+    if response_406_error:
+        return response_406_error
+
+    trucks_url = f"{request.host_url}trucks"
+    packages_url = f"{request.host_url}packages"
+
+    def generate_truck_lines():
+        for truck in services.iterate_trucks(
+            unit_of_work.DatastoreUnitOfWork(read_only=True, eventual=True),
+            owner=payload["sub"]
+        ):
+            yield flask_json.dumps(
+                serializers.truck_to_dict(
+                    truck,
+                    f"{trucks_url}/{truck.truck_id}",
+                    serializers.create_list_of_package_dict(truck.package_ids, packages_url)
+                )
+            ) + "\n"
+
+    return Response(
+        stream_with_context(generate_truck_lines()),
+        mimetype="application/x-ndjson"
+    )
+
+@bp.route("/load-plan", methods=["POST"])
+def plan_truck_loads():
+    try:
+        payload = auth.verify_jwt(request)
+    except (exceptions.NoAuthHeaderError, exceptions.InvalidHeaderError) as e:
+        response_401_error = make_response(e.error)
+        response_401_error.status_code = e.status_code
+        return response_401_error
+
+    response_406_error = common.check_for_accept_error_406(
+        request, ["application/json"]
+    )
+    if response_406_error:
+        return response_406_error
+
+    json_data = request.get_json(silent=True) or {}
+    dry_run = json_data.get("dry_run", True) if isinstance(json_data, dict) else None
+    if not isinstance(dry_run, bool):
+        response_400_error = jsonify({
+            "Error": "dry_run must be a boolean"
+        })
+        response_400_error.status_code = 400
+        return response_400_error
+
+    auth_id = payload["sub"]
+    load_plan = services.plan_truck_loads(
+        auth_id,
+        unit_of_work.DatastoreUnitOfWork(read_only=True, eventual=True),
+        unit_of_work.DatastoreUnitOfWork(read_only=True, eventual=True)
+    )
+    response_body = {
+        "dry_run": dry_run,
+        "trucks": [
+            {
+                "id": truck_id,
+                "package_ids": package_ids,
+                "self": f"{request.host_url}trucks/{truck_id}"
+            } for truck_id, package_ids in load_plan.assignments.items()
+        ],
+        "unassigned": load_plan.unassigned_package_ids
+    }
+    if not dry_run:
+        response_body["outcomes"] = services.commit_load_plan(
+            load_plan, auth_id, unit_of_work.DatastoreUnitOfWork()
+        )
+    response_200 = jsonify(response_body)
+    response_200.status_code = 200
+    return response_200
+
 @bp.route("/<truck_id>", methods=["GET", "PATCH", "PUT", "DELETE"])
 def get_update_or_delete_truck(truck_id: str):
     try:
@@ -138,7 +314,9 @@ def get_update_or_delete_truck(truck_id: str):
 
         auth_id = payload["sub"]
         truck = services.get_truck(
-            truck_id, unit_of_work.DatastoreUnitOfWork()
+            truck_id,
+            unit_of_work.DatastoreUnitOfWork(read_only=True),
+            use_cache=True
         )
         if not truck:
             response_404_error = make_response(
@@ -154,13 +332,28 @@ def get_update_or_delete_truck(truck_id: str):
             response_403_error.status_code = 403
             return response_403_error
         else:
+            packages_by_id = None
+            if "packages" in common.get_expand_values(request):
+                packages_by_id = get_packages_by_id([truck])
+            else:
+                response_304 = common.check_for_not_modified_304(
+                    request, truck.version
+                )
+                if response_304:
+                    return response_304
             response_200 = jsonify(
-                truck_to_dict(
+                serializers.truck_to_dict(
                     truck,
                     f"{request.base_url}",
-                    create_list_of_package_dict(truck.package_ids, f"{request.host_url}packages")
+                    create_packages_dict_for_truck(
+                        truck, packages_by_id, request.host_url
+                    )
                 )
             )
+            if packages_by_id is None:
+                # The expanded representation also depends on the packages,
+                # so only the plain one is tagged with the truck's version.
+                response_200.set_etag(common.etag_for_version(truck.version))
             response_200.status_code = 200
             return response_200
     
@@ -186,28 +379,54 @@ def get_update_or_delete_truck(truck_id: str):
                 "Content-Type", "application/json"
             )
             return response_400_error
-        
+
+        try:
+            max_packages, max_weight = parse_truck_capacity(json_data)
+        except ValueError as e:
+            response_400_error = jsonify({"Error": str(e)})
+            response_400_error.status_code = 400
+            return response_400_error
+
         auth_id = payload["sub"]
-        truck = services.get_truck(truck_id, unit_of_work.DatastoreUnitOfWork())
+        truck = services.get_truck(
+            truck_id, unit_of_work.DatastoreUnitOfWork(read_only=True)
+        )
         if truck:
             if truck.owner == auth_id:
                 truck_type = json_data.get("type", None)
                 truck_length = json_data.get("length", None)
                 axles = json_data.get("axles", None)
-                services.edit_truck(
-                    truck,
-                    truck_type=truck_type,
-                    truck_length=truck_length,
-                    axles=axles,
-                    unit_of_work=unit_of_work.DatastoreUnitOfWork()
-                )
+                try:
+                    truck = services.edit_truck(
+                        truck,
+                        truck_type=truck_type,
+                        truck_length=truck_length,
+                        axles=axles,
+                        max_packages=max_packages,
+                        max_weight=max_weight,
+                        unit_of_work=unit_of_work.DatastoreUnitOfWork(),
+                        if_match_versions=common.get_if_match_versions(request)
+                    )
+                except exceptions.VersionConflictError as e:
+                    return common.precondition_failed_412(e.message)
+                except exceptions.EntityNotFoundError as e:
+                    response_404_error = make_response(
+                        jsonify({
+                            "Error": e.message
+                        })
+                    )
+                    response_404_error.status_code = 404
+                    return response_404_error
+                except exceptions.TruckCapacityExceededError as e:
+                    return common.capacity_exceeded_409(e.message)
                 response_200 = jsonify(
-                    truck_to_dict(
+                    serializers.truck_to_dict(
                         truck,
                         f"{request.base_url}",
-                        create_list_of_package_dict(truck.package_ids, f"{request.host_url}packages")
+                        serializers.create_list_of_package_dict(truck.package_ids, f"{request.host_url}packages")
                     )
                 )
+                response_200.set_etag(common.etag_for_version(truck.version))
                 response_200.status_code = 200
                 return response_200
 
@@ -245,23 +464,45 @@ def get_update_or_delete_truck(truck_id: str):
             response_400_error.status_code = 400
             return response_400_error
 
+        try:
+            max_packages, max_weight = parse_truck_capacity(json_data)
+        except ValueError as e:
+            response_400_error = jsonify({"Error": str(e)})
+            response_400_error.status_code = 400
+            return response_400_error
+
         auth_id = payload["sub"]
         truck = services.get_truck(
-            truck_id, unit_of_work.DatastoreUnitOfWork()
+            truck_id, unit_of_work.DatastoreUnitOfWork(read_only=True)
         )
         if truck:
             if truck.owner == auth_id:
                 truck_type = json_data["type"]
                 length = json_data["length"]
                 axles = json_data["axles"]
-                services.edit_truck(
-                    truck,
-                    truck_type=truck_type,
-                    truck_length=length,
-                    axles=axles,
-                    unit_of_work=unit_of_work.DatastoreUnitOfWork(),
-                    clear_package_ids=True,
-                )
+                try:
+                    services.edit_truck(
+                        truck,
+                        truck_type=truck_type,
+                        truck_length=length,
+                        axles=axles,
+                        max_packages=max_packages,
+                        max_weight=max_weight,
+                        unit_of_work=unit_of_work.DatastoreUnitOfWork(),
+                        clear_package_ids=True,
+                        clear_capacity=True,
+                        if_match_versions=common.get_if_match_versions(request)
+                    )
+                except exceptions.VersionConflictError as e:
+                    return common.precondition_failed_412(e.message)
+                except exceptions.EntityNotFoundError as e:
+                    response_404_error = make_response(
+                        jsonify({
+                            "Error": e.message
+                        })
+                    )
+                    response_404_error.status_code = 404
+                    return response_404_error
                 response_303 = make_response()
                 response_303.status_code = 303
                 response_303.headers["Location"] = f"{request.host_url}trucks/{truck_id}"
@@ -289,22 +530,12 @@ def get_update_or_delete_truck(truck_id: str):
 
         auth_id = payload["sub"]
         truck = services.get_truck(
-            truck_id, unit_of_work.DatastoreUnitOfWork()
+            truck_id, unit_of_work.DatastoreUnitOfWork(read_only=True)
         )
         if truck:
             if truck.owner == auth_id:
-                if truck.has_packages():
-                    for package_id in truck.package_ids:
-                        package = services.get_package(
-                            package_id, unit_of_work.DatastoreUnitOfWork()
-                        )
-                        services.edit_package(
-                            package,
-                            unit_of_work.DatastoreUnitOfWork(),
-                            clear_carrier=True
-                        )
-                services.delete_truck(
-                    truck_id, unit_of_work.DatastoreUnitOfWork()
+                services.unload_and_delete_truck(
+                    truck, unit_of_work.DatastoreUnitOfWork()
                 )
                 response_204 = make_response()
                 response_204.status_code = 204
@@ -331,104 +562,112 @@ def assign_or_unassign_package_to_truck(truck_id: str, package_id: str):
         response_401_error.status_code = e.status_code
         return response_401_error
 
-    if request.method == "PUT":
-        response_406_error = common.check_for_accept_error_406(
-            request, ["application/json"]
-        )
-        if response_406_error:
-            return response_406_error
-
-        truck = services.get_truck(
-            truck_id,
-            unit_of_work.DatastoreUnitOfWork()
-        )
-        package = services.get_package(
-            package_id,
-            unit_of_work.DatastoreUnitOfWork()
-        )
-
-        if truck and package:
-            auth_id = payload["sub"]
-            if truck.owner != auth_id:
-                response_403_error = make_response()
-                response_403_error.status_code = 403
-                return response_403_error
+    response_406_error = common.check_for_accept_error_406(
+        request, ["application/json"]
+    )
+    if response_406_error:
+        return response_406_error
 
-            if package.carrier_id and package.carrier_id != truck.truck_id:
-                response_304_error = jsonify({
-                    "Error": "The package is already loaded on another truck"
-                })
-                response_304_error.status_code = 304
-                return response_304_error
-                
-            truck.assign_package_id(package.package_id)
-            package.carrier_id = truck.truck_id
-            services.edit_truck(
-                truck, unit_of_work.DatastoreUnitOfWork()
-            )
-            services.edit_package(
-                package, unit_of_work.DatastoreUnitOfWork()
+    auth_id = payload["sub"]
+    try:
+        if request.method == "PUT":
+            services.assign_package_to_truck(
+                truck_id, package_id, auth_id, unit_of_work.DatastoreUnitOfWork()
             )
-
-            response_204 = make_response()
-            response_204.status_code = 204
-            return response_204
         else:
-            response_404_error = make_response(
-                jsonify({
-                    "Error": "The specified truck and/or package does not exist"
-                })
+            services.unassign_package_from_truck(
+                truck_id, package_id, auth_id, unit_of_work.DatastoreUnitOfWork()
             )
-            response_404_error.status_code = 404
-            return response_404_error
-
-    if request.method == "DELETE":
-        response_406_error = common.check_for_accept_error_406(
-            request, ["application/json"]
-        )
-        if response_406_error:
-            return response_406_error
-
-        truck = services.get_truck(
-            truck_id,
-            unit_of_work.DatastoreUnitOfWork()
-        )
-        package = services.get_package(
-            package_id,
-            unit_of_work.DatastoreUnitOfWork()
+    except exceptions.EntityNotFoundError as e:
+        response_404_error = make_response(
+            jsonify({
+                "Error": e.message
+            })
         )
-        if truck and package:
-            auth_id = payload["sub"]
-            if truck.owner != auth_id:
-                response_403_error = make_response()
-                response_403_error.status_code = 403
-                return response_403_error
-            
-            if package.package_id in truck.package_ids:
-                truck.unassign_package_id(package.package_id)
-                package.carrier_id = None
-                services.edit_truck(
-                    truck, unit_of_work.DatastoreUnitOfWork()
-                )
-                services.edit_package(
-                    package, unit_of_work.DatastoreUnitOfWork()
-                )
-                response_204 = make_response()
-                response_204.status_code = 204
-                return response_204
+        response_404_error.status_code = 404
+        return response_404_error
+    except exceptions.NotOwnerError:
+        response_403_error = make_response()
+        response_403_error.status_code = 403
+        return response_403_error
+    except (
+        exceptions.PackageAlreadyAssignedError,
+        exceptions.PackageNotAssignedError
+    ) as e:
+        response_304_error = jsonify({
+            "Error": e.message
+        })
+        response_304_error.status_code = 304
+        return response_304_error
+    except exceptions.TruckCapacityExceededError as e:
+        return common.capacity_exceeded_409(e.message)
+
+    response_204 = make_response()
+    response_204.status_code = 204
+    return response_204
+
+@bp.route("<truck_id>/packages", methods=["PUT", "DELETE"])
+def assign_or_unassign_packages_to_truck(truck_id: str):
+    try:
+        payload = auth.verify_jwt(request)
+    except (exceptions.NoAuthHeaderError, exceptions.InvalidHeaderError) as e:
+        response_401_error = make_response(e.error)
+        response_401_error.status_code = e.status_code
+        return response_401_error
 
-            else:
-                response_304_error = jsonify({
-                    "Error": \
-                        "No truck with this truck_id is loaded with the package with this package_id"
-                })
-                response_304_error.status_code = 304
-                return response_304_error
+    response_415_error = common.check_for_content_type_error_415(request)
+    if response_415_error:
+        return response_415_error
+
+    response_406_error = common.check_for_accept_error_406(
+        request, ["application/json"]
+    )
+    if response_406_error:
+        return response_406_error
+
+    package_ids = get_package_ids_for_bulk_assignment(request.get_json())
+    if not package_ids:
+        response_400_error = jsonify({
+            "Error": "The request object must hold a package_ids list of between 1 and "
+                f"{services.MAX_PACKAGES_PER_BULK_ASSIGNMENT} package IDs"
+        })
+        response_400_error.status_code = 400
+        return response_400_error
+
+    auth_id = payload["sub"]
+    try:
+        if request.method == "PUT":
+            outcomes = services.assign_packages_to_truck(
+                truck_id, package_ids, auth_id, unit_of_work.DatastoreUnitOfWork()
+            )
         else:
-            response_404_error = make_response(
-                jsonify({
-                    "Error": "The specified truck and/or package does not exist"
-                })
+            outcomes = services.unassign_packages_from_truck(
+                truck_id, package_ids, auth_id, unit_of_work.DatastoreUnitOfWork()
             )
-            response_404_error.status_code = 404
-            return response_404_error
\ No newline at end of file
+    except exceptions.EntityNotFoundError as e:
+        response_404_error = make_response(
+            jsonify({
+                "Error": e.message
+            })
+        )
+        response_404_error.status_code = 404
+        return response_404_error
+    except exceptions.NotOwnerError:
+        response_403_error = make_response()
+        response_403_error.status_code = 403
+        return response_403_error
+    except exceptions.TruckCapacityExceededError as e:
+        return common.capacity_exceeded_409(e.message)
+
+    response_200 = jsonify({
+        "packages": [
+            {
+                # Package IDs are Datastore integer IDs everywhere else.
+                "id": int(package_id),
+                "status": outcomes[package_id],
+                "self": f"{request.host_url}packages/{package_id}"
+            } for package_id in package_ids
+        ]
+    })
+    response_200.status_code = 200
+    return response_200